@@ -17,6 +17,25 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = os.getenv('TRACK_MODIFICATIONS', 'False') == 'True'
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 app.config['JWT_SECRET_KEY'] = os.getenv('SECRET_KEY')  # Use same key for JWT
+# In-process cache for product reads (entries are also invalidated on writes)
+app.config['CATALOG_CACHE_MAX_ENTRIES'] = int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', '2048'))
+app.config['CATALOG_CACHE_TTL'] = float(os.getenv('CATALOG_CACHE_TTL', '30'))
+# Response compression (gzip, or brotli when the package is installed)
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+app.config['COMPRESS_LEVEL'] = int(os.getenv('COMPRESS_LEVEL', '6'))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+app.config['COMPRESS_CACHE_MAX_BYTES'] = int(os.getenv('COMPRESS_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+# Idempotency-Key replays: in-memory front cache TTL and database retention
+app.config['IDEMPOTENCY_CACHE_TTL'] = float(os.getenv('IDEMPOTENCY_CACHE_TTL', '300'))
+app.config['IDEMPOTENCY_KEY_RETENTION_HOURS'] = float(os.getenv('IDEMPOTENCY_KEY_RETENTION_HOURS', '24'))
+# Delivered (or unconsumed) outbox events are deleted after this long
+app.config['OUTBOX_RETENTION_HOURS'] = float(os.getenv('OUTBOX_RETENTION_HOURS', '168'))
+# Cart stock holds: how long a verified cart keeps its units set aside
+app.config['STOCK_HOLD_MINUTES'] = float(os.getenv('STOCK_HOLD_MINUTES', '10'))
+# Product change streams (SSE): open streams per worker, and how long one
+# stream lasts before the client reconnects
+app.config['STREAM_MAX_SUBSCRIBERS'] = int(os.getenv('STREAM_MAX_SUBSCRIBERS', '5000'))
+app.config['STREAM_MAX_SECONDS'] = float(os.getenv('STREAM_MAX_SECONDS', '300'))
 
 # Add route to serve static files directly
 @app.route('/static/<path:filename>')
@@ -38,34 +57,100 @@ from models.product import Product
 from models.wishlist import Wishlist
 from models.order import Order
 from models.order_details import OrderDetails
+from models.order_archive import ArchivedOrder, ArchivedOrderDetails
 from models.vendor_application import VendorApplication
+from models.idempotency_key import IdempotencyKey
+from models.outbox_event import OutboxEvent
+from models.sales_rollup import SalesRollup
+from models.stock_hold import StockHold
+from models.stock_shard import StockShard
 
 # ✅ Now after all models are loaded, create tables
 with app.app_context():
     db.create_all()
 
+
+def missing_columns():
+    """"table.column" for every model column the database lacks.
+    db.create_all() never adds columns to existing tables; migrate.py does."""
+    inspector = db.inspect(db.engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(f"{table.name}.{column.name}" for column in table.columns if column.name not in existing)
+    return missing
+
+
+def check_schema():
+    """Refuse to serve from a database that migrate.py has not brought up
+    to date; every query on those tables would fail."""
+    with app.app_context():
+        missing = missing_columns()
+    if missing:
+        raise RuntimeError(f"Database is missing columns {', '.join(missing)}; run python migrate.py")
+
 # ✅ Import routes in a specific order to ensure correct registration
 # First, import most basic routes
 from routes.user import *
 from routes.user_profile import *
 from routes.payment import *
 from routes.product import *
+from routes.product_stock import *
 from routes.wishlist import *
 from routes.order import *
+from routes.metrics import *
+from routes.analytics import *
 
 # Then import vendor-related routes to ensure they have priority
 from routes.vendor_application import *
 from routes.vendor_products import *  # Import this first for vendor product routes
+from routes.vendor_orders import *
 from routes.vendor import *  # Import this after to avoid overwriting routes
 
+# Compress API responses
+from services.compression import response_compressor
+
 # Import and register upload blueprint
 from routes.upload import upload_bp
 app.register_blueprint(upload_bp)
 
+def start_background_workers():
+    """Start this worker's background threads. Only the server entrypoints
+    (run.py, wsgi.py) call this, so scripts that import app do not start
+    them. Each can be turned off with its environment flag."""
+    # Build in-memory catalog indexes (search, suggest)
+    if os.getenv('SEARCH_INDEX_WARMUP', 'True') == 'True':
+        from services.catalog_events import start_index_warmup
+        start_index_warmup(app)
+
+    # Fan product stream (SSE) changes out to every worker
+    if os.getenv('STREAM_LISTENER', 'True') == 'True':
+        from services.stream_hub import product_stream_hub
+        product_stream_hub.start(app)
+
+    # Deliver order events from the outbox
+    if os.getenv('OUTBOX_DISPATCHER', 'True') == 'True':
+        from services.outbox import outbox_dispatcher
+        outbox_dispatcher.start(app)
+
+    # Delete expired cart stock holds
+    if os.getenv('STOCK_HOLD_SWEEPER', 'True') == 'True':
+        from services.holds import hold_sweeper
+        hold_sweeper.start(app)
+
+    # Re-spread hot products' stock shards and sync products.stock
+    if os.getenv('STOCK_SHARD_REBALANCER', 'True') == 'True':
+        from services.stock_shards import shard_rebalancer
+        shard_rebalancer.start(app)
+
 # Print registered routes for debugging
 print("Registered routes:")
 for rule in app.url_map.iter_rules():
     print(f"{rule} - {rule.methods}")
 
 if __name__ == '__main__':
+    check_schema()
+    # The debug reloader serves from a child process; start workers there
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers()
     app.run(debug=True)
\ No newline at end of file
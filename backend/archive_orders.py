@@ -0,0 +1,81 @@
+# backend/archive_orders.py
+# Move old Delivered/Cancelled orders (and their line items) from orders /
+# order_details into orders_archive / order_details_archive, keeping ids.
+# Archived orders are still served by /api/order/get (single orders and a
+# user's history) and by the vendor inbox, /api/vendor/orders.
+#
+# Runs in small batches, each its own short transaction, so it never holds
+# locks on many rows and can run while the app is serving traffic:
+#   python archive_orders.py [days_old] [batch_size]
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app import app, db
+from models.order import Order
+from models.order_details import OrderDetails
+from models.order_archive import ArchivedOrder, ArchivedOrderDetails
+
+ARCHIVABLE_STATUSES = ("Delivered", "Cancelled")
+DEFAULT_DAYS_OLD = 180
+DEFAULT_BATCH_SIZE = 500
+# Pause between batches to leave room for foreground queries
+BATCH_PAUSE_SECONDS = 0.05
+
+ORDER_COLUMNS = [column.name for column in Order.__table__.columns]
+DETAIL_COLUMNS = [column.name for column in OrderDetails.__table__.columns]
+
+
+def archive_batch(cutoff, batch_size):
+    """Move up to batch_size archivable orders; returns how many moved."""
+    select_ids = db.select(Order.id) \
+        .where(Order.status.in_(ARCHIVABLE_STATUSES), Order.created_at < cutoff) \
+        .order_by(Order.id).limit(batch_size)
+    if db.engine.dialect.name == "postgresql":
+        # Skip orders a request is touching right now; they go next run
+        select_ids = select_ids.with_for_update(skip_locked=True)
+    order_ids = db.session.execute(select_ids).scalars().all()
+    if not order_ids:
+        db.session.rollback()
+        return 0
+
+    db.session.execute(db.insert(ArchivedOrder).from_select(
+        ORDER_COLUMNS,
+        db.select(*[Order.__table__.c[name] for name in ORDER_COLUMNS]).where(Order.id.in_(order_ids))
+    ))
+    db.session.execute(db.insert(ArchivedOrderDetails).from_select(
+        DETAIL_COLUMNS,
+        db.select(*[OrderDetails.__table__.c[name] for name in DETAIL_COLUMNS])
+        .where(OrderDetails.order_id.in_(order_ids))
+    ))
+    db.session.execute(
+        db.delete(OrderDetails).where(OrderDetails.order_id.in_(order_ids))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        db.delete(Order).where(Order.id.in_(order_ids))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return len(order_ids)
+
+
+def archive_orders(days_old=DEFAULT_DAYS_OLD, batch_size=DEFAULT_BATCH_SIZE):
+    cutoff = datetime.utcnow() - timedelta(days=days_old)
+    total = 0
+    with app.app_context():
+        while True:
+            moved = archive_batch(cutoff, batch_size)
+            if not moved:
+                break
+            total += moved
+            print(f"Archived {total} orders")
+            time.sleep(BATCH_PAUSE_SECONDS)
+    print(f"Done: {total} orders older than {days_old} days archived")
+    return total
+
+
+if __name__ == "__main__":
+    days_old = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DAYS_OLD
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BATCH_SIZE
+    archive_orders(days_old, batch_size)
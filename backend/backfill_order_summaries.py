@@ -0,0 +1,47 @@
+# backend/backfill_order_summaries.py
+# Fill orders.item_count / unit_count / preview for orders placed before those
+# columns existed (python migrate.py adds the columns; run it first). Works
+# through orders missing a summary in id batches, so it is safe to re-run
+# and to run while the app is serving traffic.
+#
+#   python backfill_order_summaries.py [batch_size]
+import sys
+
+from app import app, check_schema, db
+from models.order import Order
+from services.orders import order_details_options, order_summary
+
+
+def backfill(batch_size=500):
+    with app.app_context():
+        total = 0
+        last_id = 0
+        while True:
+            orders = Order.query.options(*order_details_options()) \
+                .filter(Order.item_count.is_(None), Order.id > last_id) \
+                .order_by(Order.id).limit(batch_size).all()
+            if not orders:
+                break
+
+            updates = []
+            for order in orders:
+                summary = order_summary([
+                    (detail.product_id, detail.quantity,
+                     detail.product.name if detail.product else "Unknown Product",
+                     detail.product.image_url if detail.product else None)
+                    for detail in order.details
+                ])
+                updates.append({"id": order.id, **summary})
+
+            last_id = orders[-1].id
+            db.session.execute(db.update(Order), updates)
+            db.session.commit()
+            total += len(updates)
+            print(f"Backfilled {total} orders (through id {last_id})")
+
+        print(f"Done: {total} orders backfilled")
+
+
+if __name__ == "__main__":
+    check_schema()
+    backfill(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,100 @@
+# backend/benchmark_checkout.py
+# Concurrency benchmark for /api/order/create: N parallel buyers race for one
+# product with limited stock. Reports throughput and checks that exactly
+# min(buyers, stock) orders succeed and stock never goes negative.
+#
+# Run against a disposable PostgreSQL database (the app's DATABASE_URI):
+#   python benchmark_checkout.py [buyers] [stock]
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from app import app, db
+from models.order import Order
+from models.order_details import OrderDetails
+from models.payment import Payment
+from models.product import Product
+from models.user import User
+
+
+def seed(stock):
+    tag = uuid.uuid4().hex[:8]
+    with app.app_context():
+        user = User(username=f"bench_{tag}", email=f"bench_{tag}@example.com",
+                    password=bcrypt.hashpw(b"benchmark", bcrypt.gensalt()))
+        db.session.add(user)
+        db.session.flush()
+        payment = Payment(username=user.username, payment_type="Card",
+                          card_number_last4="4242", card_expiry_date="12/2030")
+        product = Product(name=f"Benchmark item {tag}", price=10.0, stock=stock)
+        db.session.add_all([payment, product])
+        db.session.commit()
+        return user.username, payment.id, product.id
+
+
+def cleanup(username, payment_id, product_id):
+    with app.app_context():
+        order_ids = [order_id for (order_id,) in db.session.query(Order.id).filter_by(username=username)]
+        if order_ids:
+            OrderDetails.query.filter(OrderDetails.order_id.in_(order_ids)).delete(synchronize_session=False)
+            Order.query.filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+        Payment.query.filter_by(id=payment_id).delete()
+        Product.query.filter_by(id=product_id).delete()
+        User.query.filter_by(username=username).delete()
+        db.session.commit()
+
+
+def buy(username, payment_id, product_id):
+    payload = {
+        "username": username, "first_name": "Bench", "last_name": "Buyer",
+        "address1": "1 Main St", "country": "US", "state": "NC", "city": "Charlotte",
+        "zip_code": "28223", "phone_number": "5550000000", "subtotal_amount": 10.0,
+        "sales_tax_amount": 0.0, "shipping_fee": 0.0, "total_amount": 10.0,
+        "payment_id": payment_id,
+        "products": [{"product_id": product_id, "quantity": 1, "unit_price": 10.0}],
+    }
+    started = time.perf_counter()
+    response = app.test_client().post("/api/order/create", json=payload)
+    return response.status_code, time.perf_counter() - started
+
+
+def run(buyers=200, stock=50):
+    username, payment_id, product_id = seed(stock)
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=buyers) as pool:
+            results = list(pool.map(lambda _: buy(username, payment_id, product_id), range(buyers)))
+        elapsed = time.perf_counter() - started
+
+        succeeded = sum(1 for status, _ in results if status == 201)
+        rejected = sum(1 for status, _ in results if status == 400)
+        errors = buyers - succeeded - rejected
+        latencies = sorted(latency for _, latency in results)
+
+        with app.app_context():
+            final_stock = db.session.get(Product, product_id).stock
+            units_ordered = db.session.query(db.func.coalesce(db.func.sum(OrderDetails.quantity), 0)) \
+                .filter(OrderDetails.product_id == product_id).scalar()
+
+        print(f"buyers={buyers} stock={stock} elapsed={elapsed:.3f}s "
+              f"throughput={buyers / elapsed:.1f} req/s")
+        print(f"latency p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+              f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms")
+        print(f"succeeded={succeeded} rejected={rejected} errors={errors} "
+              f"final_stock={final_stock} units_ordered={units_ordered}")
+
+        oversold = units_ordered - stock if units_ordered > stock else 0
+        ok = (succeeded == min(buyers, stock) and final_stock == stock - succeeded
+              and units_ordered == succeeded and oversold == 0 and errors == 0)
+        print(f"oversold={oversold} -> {'OK' if ok else 'FAILED'}")
+        return ok
+    finally:
+        cleanup(username, payment_id, product_id)
+
+
+if __name__ == "__main__":
+    buyers = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    stock = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    sys.exit(0 if run(buyers, stock) else 1)
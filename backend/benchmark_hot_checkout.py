@@ -0,0 +1,68 @@
+# backend/benchmark_hot_checkout.py
+# Checkout throughput for one heavily contended product, on the single-row
+# path and in hot-product mode (stock sharded over K counters, see
+# services/stock_shards.py). Each run also checks nothing was oversold.
+#
+# Run against a disposable PostgreSQL database (the app's DATABASE_URI),
+# served from a pool large enough for the buyer threads:
+#   python benchmark_hot_checkout.py [buyers] [stock] [shards]
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, db
+from models.order_details import OrderDetails
+from benchmark_checkout import seed, cleanup, buy
+from services.stock import stock_levels
+from services.stock_shards import DEFAULT_SHARDS, enable_hot_mode, disable_hot_mode
+
+
+def run_mode(buyers, stock, shards):
+    """One checkout race; shards=0 is the single-row path. Returns
+    (throughput, ok)."""
+    username, payment_id, product_id = seed(stock)
+    try:
+        if shards:
+            with app.app_context():
+                enable_hot_mode(product_id, shards)
+                db.session.commit()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=buyers) as pool:
+            results = list(pool.map(lambda _: buy(username, payment_id, product_id), range(buyers)))
+        elapsed = time.perf_counter() - started
+
+        succeeded = sum(1 for status, _ in results if status == 201)
+        errors = sum(1 for status, _ in results if status not in (201, 400))
+        latencies = sorted(latency for _, latency in results)
+        with app.app_context():
+            final_stock = stock_levels([product_id])[product_id][0]
+            units_ordered = db.session.query(db.func.coalesce(db.func.sum(OrderDetails.quantity), 0)) \
+                .filter(OrderDetails.product_id == product_id).scalar()
+            if shards:
+                disable_hot_mode(product_id)
+                db.session.commit()
+
+        ok = (succeeded == min(buyers, stock) and units_ordered == succeeded
+              and final_stock == stock - succeeded and errors == 0)
+        label = f"hot ({shards} shards)" if shards else "single row"
+        print(f"{label}: buyers={buyers} elapsed={elapsed:.3f}s throughput={buyers / elapsed:.1f} req/s "
+              f"p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+              f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms")
+        print(f"  succeeded={succeeded} errors={errors} final_stock={final_stock} "
+              f"units_ordered={units_ordered} -> {'OK' if ok else 'FAILED'}")
+        return buyers / elapsed, ok
+    finally:
+        cleanup(username, payment_id, product_id)
+
+
+def run(buyers=200, stock=1000, shards=DEFAULT_SHARDS):
+    single_throughput, single_ok = run_mode(buyers, stock, 0)
+    hot_throughput, hot_ok = run_mode(buyers, stock, shards)
+    print(f"speedup={hot_throughput / single_throughput:.2f}x")
+    return single_ok and hot_ok
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:4]]
+    sys.exit(0 if run(*args) else 1)
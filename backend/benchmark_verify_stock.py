@@ -0,0 +1,87 @@
+# backend/benchmark_verify_stock.py
+# Load test for /api/product/verify-stock: concurrent clients each verify
+# 50-line carts (with repeated products). Reports throughput, latency and
+# SQL statements per request.
+#
+# Run against a disposable PostgreSQL database (the app's DATABASE_URI):
+#   python benchmark_verify_stock.py [clients] [requests_per_client] [cart_lines]
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+
+from app import app, db
+from models.product import Product
+
+CATALOG_SIZE = 500
+
+
+def seed():
+    with app.app_context():
+        products = [Product(name=f"Verify benchmark {i}", price=10.0, stock=random.randint(0, 20))
+                    for i in range(CATALOG_SIZE)]
+        db.session.add_all(products)
+        db.session.commit()
+        return [product.id for product in products]
+
+
+def cleanup(product_ids):
+    with app.app_context():
+        Product.query.filter(Product.id.in_(product_ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def make_cart(product_ids, lines):
+    # A few products appear on more than one line, as in real carts
+    distinct = random.sample(product_ids, max(1, lines - lines // 10))
+    return [{"id": random.choice(distinct), "quantity": random.randint(1, 3)} for _ in range(lines)]
+
+
+def run(clients=32, requests_per_client=20, lines=50):
+    product_ids = seed()
+    statements = [0]
+    counter_lock = threading.Lock()
+
+    def count_statement(*args):
+        with counter_lock:
+            statements[0] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count_statement)
+
+    def client_run(_):
+        client = app.test_client()
+        latencies = []
+        for _ in range(requests_per_client):
+            cart = make_cart(product_ids, lines)
+            started = time.perf_counter()
+            response = client.post("/api/product/verify-stock", json={"items": cart})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"verify-stock returned {response.status_code}")
+        return latencies
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            latencies = sorted(l for batch in pool.map(client_run, range(clients)) for l in batch)
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+        cleanup(product_ids)
+
+    total = len(latencies)
+    print(f"clients={clients} requests={total} cart_lines={lines} elapsed={elapsed:.3f}s "
+          f"throughput={total / elapsed:.1f} req/s")
+    print(f"latency p50={latencies[total // 2] * 1000:.1f}ms "
+          f"p99={latencies[int(total * 0.99) - 1] * 1000:.1f}ms")
+    print(f"sql statements per request={statements[0] / total:.2f}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:4]]
+    run(*args)
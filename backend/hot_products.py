@@ -0,0 +1,75 @@
+# backend/hot_products.py
+# Turn hot-product mode (sharded stock counters, see services/stock_shards.py)
+# on or off. Enable it before a flash sale so concurrent checkouts of one
+# product stop queueing on its products.stock row; disable it afterwards to
+# fold the shards back into products.stock.
+#
+#   python hot_products.py enable <product_id> [shards]
+#   python hot_products.py disable <product_id>
+#   python hot_products.py status
+import sys
+
+from app import app, check_schema, db
+from models.product import Product
+from models.stock_shard import StockShard
+from services import catalog_events
+from services.stock_shards import DEFAULT_SHARDS, MAX_SHARDS, enable_hot_mode, disable_hot_mode
+
+USAGE = "usage: python hot_products.py enable <product_id> [shards] | disable <product_id> | status"
+
+
+def enable(product_id, shards=DEFAULT_SHARDS):
+    if not 1 <= shards <= MAX_SHARDS:
+        print(f"shards must be between 1 and {MAX_SHARDS}")
+        return False
+    product = enable_hot_mode(product_id, shards)
+    if product is None:
+        db.session.rollback()
+        print(f"Product {product_id} not found")
+        return False
+    db.session.commit()
+    catalog_events.stock_changed([product])
+    print(f"Product {product_id} is hot: {product.stock} units over {shards} shards")
+    return True
+
+
+def disable(product_id):
+    product = disable_hot_mode(product_id)
+    if product is None:
+        db.session.rollback()
+        print(f"Product {product_id} not found")
+        return False
+    db.session.commit()
+    catalog_events.stock_changed([product])
+    print(f"Product {product_id} folded back: {product.stock} units in products.stock")
+    return True
+
+
+def status():
+    rows = db.session.execute(
+        db.select(Product.id, Product.name, Product.stock_shards,
+                  db.func.sum(StockShard.stock), db.func.min(StockShard.stock), db.func.max(StockShard.stock))
+        .join(StockShard, StockShard.product_id == Product.id)
+        .group_by(Product.id, Product.name, Product.stock_shards).order_by(Product.id)
+    ).all()
+    for product_id, name, shards, total, low, high in rows:
+        print(f"{product_id} {name}: {total} units over {shards} shards (min {low}, max {high})")
+    if not rows:
+        print("No hot products")
+    return True
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    check_schema()
+    with app.app_context():
+        if args[:1] == ["enable"] and len(args) in (2, 3):
+            ok = enable(int(args[1]), int(args[2]) if len(args) == 3 else DEFAULT_SHARDS)
+        elif args[:1] == ["disable"] and len(args) == 2:
+            ok = disable(int(args[1]))
+        elif args == ["status"]:
+            ok = status()
+        else:
+            print(USAGE)
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,112 @@
+# backend/migrate.py
+# Bring an existing PostgreSQL database up to the current models.
+# db.create_all() only creates missing tables; columns and indexes added to
+# tables that already exist are applied here. Every step is idempotent, so
+# run it on each deploy before starting the app:
+#
+#   python migrate.py
+#
+# Indexes are built with CREATE INDEX CONCURRENTLY, so tables stay writable
+# while they build. An index left invalid by an interrupted build is
+# dropped and rebuilt. Foreign keys whose ON DELETE rule changed are
+# re-added NOT VALID and then validated, so neither step blocks writes
+# for the length of a table scan.
+import sys
+
+from sqlalchemy.schema import AddConstraint, CreateIndex
+
+from app import app, db, missing_columns
+
+ADD_COLUMNS = [
+    # Order item summary (see backfill_order_summaries.py for existing rows)
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS item_count INTEGER",
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS unit_count INTEGER",
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS preview JSON",
+    # Outbox retry backoff
+    "ALTER TABLE outbox_events ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP WITHOUT TIME ZONE",
+    # Hot-product mode (sharded stock counters)
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS stock_shards INTEGER NOT NULL DEFAULT 0",
+]
+
+
+def index_statements():
+    """(index name, CREATE INDEX CONCURRENTLY IF NOT EXISTS ...) for every
+    index declared on the models."""
+    for table in db.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            index.dialect_kwargs["postgresql_concurrently"] = True
+            try:
+                statement = str(CreateIndex(index, if_not_exists=True).compile(dialect=db.engine.dialect))
+            finally:
+                index.dialect_kwargs["postgresql_concurrently"] = False
+            yield index.name, statement
+
+
+def foreign_key_statements():
+    """(replace, validate) statements for each model foreign key whose ON
+    DELETE rule differs from the database's: replace drops the constraint
+    and re-adds it NOT VALID (one transaction), validate then checks the
+    existing rows without blocking writes."""
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {
+            (tuple(fk["constrained_columns"]), fk["referred_table"]): fk
+            for fk in inspector.get_foreign_keys(table.name)
+        }
+        for constraint in table.foreign_key_constraints:
+            wanted = (constraint.ondelete or "NO ACTION").upper()
+            found = existing.get((tuple(constraint.column_keys), constraint.referred_table.name))
+            if found is None or (found["options"].get("ondelete") or "NO ACTION").upper() == wanted:
+                continue
+            name, constraint.name = constraint.name, found["name"]
+            try:
+                added = str(AddConstraint(constraint).compile(dialect=db.engine.dialect))
+            finally:
+                constraint.name = name
+            replace = [f'ALTER TABLE "{table.name}" DROP CONSTRAINT "{found["name"]}"', f"{added} NOT VALID"]
+            yield replace, f'ALTER TABLE "{table.name}" VALIDATE CONSTRAINT "{found["name"]}"'
+
+
+def create_indexes():
+    # CONCURRENTLY cannot run inside a transaction block
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        invalid = set(connection.execute(db.text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+        )).scalars())
+        for name, statement in index_statements():
+            if name in invalid:
+                print(f"Rebuilding invalid index {name}")
+                connection.execute(db.text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+            connection.execute(db.text(statement))
+            print(f"Index {name} ok")
+
+
+def migrate():
+    with app.app_context():
+        if db.engine.dialect.name != "postgresql":
+            print("migrate.py targets PostgreSQL; use reset_db.py for other databases")
+            return False
+        db.create_all()
+        for statement in ADD_COLUMNS:
+            db.session.execute(db.text(statement))
+        db.session.commit()
+        for replace, validate in list(foreign_key_statements()):
+            for statement in replace:
+                print(statement)
+                db.session.execute(db.text(statement))
+            db.session.commit()
+            print(validate)
+            db.session.execute(db.text(validate))
+            db.session.commit()
+        missing = missing_columns()
+        if missing:
+            print(f"Still missing columns {', '.join(missing)}; add them to ADD_COLUMNS")
+            return False
+        print("Tables and columns ok")
+        create_indexes()
+    print("Migration complete")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if migrate() else 1)
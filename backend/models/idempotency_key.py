@@ -0,0 +1,28 @@
+# backend/models/idempotency_key.py
+from app import db
+from datetime import datetime
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    # One row per (endpoint, client key); the unique index is what makes
+    # concurrent duplicates across workers collide instead of both running
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'key', name='uq_idempotency_keys_scope_key'),
+        db.Index('ix_idempotency_keys_created_at', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(100), nullable=False)        # e.g. "order.create"
+    key = db.Column(db.String(255), nullable=False)          # Idempotency-Key header
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of the request body
+    status = db.Column(db.String(20), default="pending")     # pending, committed (side effects, no response yet), completed
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+    def __init__(self, scope, key, request_hash, status="pending"):
+        self.scope = scope
+        self.key = key
+        self.request_hash = request_hash
+        self.status = status
@@ -3,6 +3,12 @@ from datetime import datetime
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    # Keyset pagination of order history, newest first
+    __table_args__ = (
+        db.Index('ix_orders_username_created_at_id', 'username', 'created_at', 'id'),
+        db.Index('ix_orders_status_created_at_id', 'status', 'created_at', 'id'),
+        db.Index('ix_orders_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(200), db.ForeignKey('users.username'), nullable=False)
@@ -30,8 +36,18 @@ class Order(db.Model):
     status = db.Column(db.String(100), default="Pending")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Line-item summary written with the details so the order list needs
+    # only this table (see backfill_order_summaries.py for older orders)
+    item_count = db.Column(db.Integer)   # number of line items
+    unit_count = db.Column(db.Integer)   # sum of quantities
+    preview = db.Column(db.JSON)         # first few items: id, name, image, quantity
+
+    # Line items, in insertion order
+    details = db.relationship('OrderDetails', backref='order', lazy=True, order_by='OrderDetails.id')
+
     def __init__(self, username, first_name, last_name, address1, address2, country, state, city, zip_code, phone_number,
-                 subtotal_amount, sales_tax_amount, shipping_fee, total_amount, payment_id=None, status="Pending"):
+                 subtotal_amount, sales_tax_amount, shipping_fee, total_amount, payment_id=None, status="Pending",
+                 item_count=None, unit_count=None, preview=None):
         self.username = username
         self.first_name = first_name
         self.last_name = last_name
@@ -48,3 +64,6 @@ class Order(db.Model):
         self.total_amount = total_amount
         self.payment_id = payment_id
         self.status = status
+        self.item_count = item_count
+        self.unit_count = unit_count
+        self.preview = preview
@@ -0,0 +1,67 @@
+# backend/models/order_archive.py
+from app import db
+from datetime import datetime
+
+# Cold storage for old Delivered/Cancelled orders, filled by
+# archive_orders.py. Same columns as orders/order_details (ids are kept) so
+# rows move with INSERT ... SELECT; no foreign keys, so archived rows never
+# block deletes elsewhere.
+
+class ArchivedOrder(db.Model):
+    __tablename__ = 'orders_archive'
+    __table_args__ = (
+        db.Index('ix_orders_archive_username_created_at_id', 'username', 'created_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    username = db.Column(db.String(200), nullable=False)
+    payment_id = db.Column(db.Integer)
+
+    first_name = db.Column(db.String(100), nullable=False)
+    last_name = db.Column(db.String(100), nullable=False)
+    address1 = db.Column(db.String(200), nullable=False)
+    address2 = db.Column(db.String(200))
+    country = db.Column(db.String(100), nullable=False)
+    state = db.Column(db.String(100), nullable=False)
+    city = db.Column(db.String(100), nullable=False)
+    zip_code = db.Column(db.String(20), nullable=False)
+    phone_number = db.Column(db.String(20), nullable=False)
+
+    subtotal_amount = db.Column(db.Float, nullable=False)
+    sales_tax_amount = db.Column(db.Float, nullable=False)
+    shipping_fee = db.Column(db.Float, nullable=False)
+    total_amount = db.Column(db.Float, nullable=False)
+
+    status = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime)
+
+    item_count = db.Column(db.Integer)
+    unit_count = db.Column(db.Integer)
+    preview = db.Column(db.JSON)
+
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    details = db.relationship(
+        'ArchivedOrderDetails', lazy=True, order_by='ArchivedOrderDetails.id',
+        primaryjoin='ArchivedOrder.id == foreign(ArchivedOrderDetails.order_id)'
+    )
+
+
+class ArchivedOrderDetails(db.Model):
+    __tablename__ = 'order_details_archive'
+    __table_args__ = (
+        db.Index('ix_order_details_archive_order_id', 'order_id'),
+        # Vendor inbox: products of a vendor -> the archived orders containing them
+        db.Index('ix_order_details_archive_product_id_order_id', 'product_id', 'order_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_id = db.Column(db.Integer, nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.Float, nullable=False)
+
+    product = db.relationship(
+        'Product', lazy=True, viewonly=True,
+        primaryjoin='foreign(ArchivedOrderDetails.product_id) == Product.id'
+    )
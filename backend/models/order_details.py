@@ -3,6 +3,11 @@ from datetime import datetime
 
 class OrderDetails(db.Model):
     __tablename__ = 'order_details'
+    __table_args__ = (
+        db.Index('ix_order_details_order_id', 'order_id'),
+        # Vendor inbox: products of a vendor -> the orders containing them
+        db.Index('ix_order_details_product_id_order_id', 'product_id', 'order_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
@@ -10,6 +15,8 @@ class OrderDetails(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Float, nullable=False)  # Save price at the time of order
 
+    product = db.relationship('Product', lazy=True)
+
     def __init__(self, order_id, product_id, quantity, unit_price):
         self.order_id = order_id
         self.product_id = product_id
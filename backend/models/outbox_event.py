@@ -0,0 +1,30 @@
+# backend/models/outbox_event.py
+from app import db
+from datetime import datetime
+
+class OutboxEvent(db.Model):
+    __tablename__ = 'outbox_events'
+    # The dispatcher scans undelivered events in id order and checks each
+    # order's earlier events
+    __table_args__ = (
+        db.Index('ix_outbox_events_status_id', 'status', 'id'),
+        db.Index('ix_outbox_events_order_id_id', 'order_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(100), nullable=False)  # order.created, order.status_changed, order.cancelled
+    order_id = db.Column(db.Integer, nullable=False)        # events of one order are delivered in order
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), default="pending")    # pending, dispatched, failed, skipped (no consumer)
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    next_attempt_at = db.Column(db.DateTime)                # set after a failed delivery (backoff)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    dispatched_at = db.Column(db.DateTime)
+
+    def __init__(self, event_type, order_id, payload):
+        self.event_type = event_type
+        self.order_id = order_id
+        self.payload = payload
+        self.status = "pending"
+        self.attempts = 0
@@ -3,6 +3,18 @@ from app import db
 # Database model for PostgreSQL
 class Product(db.Model):
     __tablename__ = 'products'  # explicitly calling for 'products' table in the db
+    # Composite indexes backing keyset pagination on the catalog listing
+    __table_args__ = (
+        db.Index('ix_products_active_created_at_id', 'active', 'created_at', 'id'),
+        db.Index('ix_products_active_price_id', 'active', 'price', 'id'),
+        db.Index('ix_products_category_created_at_id', 'category', 'created_at', 'id'),
+        db.Index('ix_products_vendor_id_created_at_id', 'vendor_id', 'created_at', 'id'),
+        # Lets per-worker caches catch up on recent writes
+        db.Index('ix_products_updated_at', 'updated_at'),
+    )
+    # Fetch created_at/updated_at with RETURNING on flush, so reading them
+    # (catalog_events.snapshot) does not cost a SELECT per product
+    __mapper_args__ = {"eager_defaults": True}
 
     id = db.Column(db.Integer, primary_key=True)
     vendor_id = db.Column(db.Integer, db.ForeignKey('vendors.id'), nullable=True)
@@ -13,6 +25,9 @@ class Product(db.Model):
     rating = db.Column(db.Float)
     image_url = db.Column(db.String(500))
     stock = db.Column(db.Integer, default=0)
+    # > 0 while the product is in hot mode: stock lives in that many
+    # stock_shards rows and this column is a synced copy of their sum
+    stock_shards = db.Column(db.Integer, default=0, nullable=False)
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
@@ -0,0 +1,29 @@
+# backend/models/sales_rollup.py
+from app import db
+
+class SalesRollup(db.Model):
+    __tablename__ = 'sales_rollups'
+    # One row per product per day, kept up to date from the order outbox
+    # (see services/rollups.py); vendor and category are copied from the
+    # product when the first sale of the day is recorded
+    __table_args__ = (
+        db.Index('ix_sales_rollups_vendor_id_day', 'vendor_id', 'day'),
+        db.Index('ix_sales_rollups_category_day', 'category', 'day'),
+    )
+
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    vendor_id = db.Column(db.Integer)
+    category = db.Column(db.String(100))
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    order_lines = db.Column(db.Integer, nullable=False, default=0)  # order_details rows
+
+    def __init__(self, day, product_id, vendor_id=None, category=None, units=0, revenue=0.0, order_lines=0):
+        self.day = day
+        self.product_id = product_id
+        self.vendor_id = vendor_id
+        self.category = category
+        self.units = units
+        self.revenue = revenue
+        self.order_lines = order_lines
@@ -0,0 +1,29 @@
+# backend/models/stock_hold.py
+from app import db
+from datetime import datetime
+
+class StockHold(db.Model):
+    __tablename__ = 'stock_holds'
+    # One row per product per cart; a hold counts against available stock
+    # until expires_at (see services/holds.py)
+    __table_args__ = (
+        db.UniqueConstraint('hold_token', 'product_id', name='uq_stock_holds_hold_token_product_id'),
+        db.Index('ix_stock_holds_product_id_expires_at', 'product_id', 'expires_at'),
+        db.Index('ix_stock_holds_expires_at', 'expires_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    hold_token = db.Column(db.String(64), nullable=False)  # identifies the cart
+    username = db.Column(db.String(200))
+    # Holds go with their product (vendor deletes, delete-all-products)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __init__(self, hold_token, product_id, quantity, expires_at, username=None):
+        self.hold_token = hold_token
+        self.product_id = product_id
+        self.quantity = quantity
+        self.expires_at = expires_at
+        self.username = username
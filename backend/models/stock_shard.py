@@ -0,0 +1,16 @@
+from app import db
+
+class StockShard(db.Model):
+    __tablename__ = 'stock_shards'
+    # Sub-counters of a hot product's stock (see services/stock_shards.py).
+    # While a product has shards they hold its real stock; products.stock
+    # is a periodically synced copy of their sum.
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True)
+    stock = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, product_id, shard, stock=0):
+        self.product_id = product_id
+        self.shard = shard
+        self.stock = stock
@@ -0,0 +1,150 @@
+# backend/rebuild_sales_rollups.py
+# Recompute sales_rollups from orders/order_details (live and archived) and
+# compare them with the incrementally maintained table.
+#
+#   python rebuild_sales_rollups.py           # verify only, report differences
+#   python rebuild_sales_rollups.py --apply   # replace the table with the recomputed rows
+#
+# Both modes stream: the recompute is one GROUP BY ordered like the rollup
+# table's primary key, compared row by row; --apply rebuilds with a single
+# INSERT ... SELECT. Rollups are maintained by the outbox dispatcher (see
+# services/rollups.py), so --apply holds the dispatcher's lock and rebuilds
+# from one snapshot, marking the order events that snapshot already counted
+# as dispatched. Events committed after it are left for the dispatcher.
+import sys
+from datetime import datetime
+
+from app import app, db
+from models.order import Order
+from models.order_details import OrderDetails
+from models.order_archive import ArchivedOrder, ArchivedOrderDetails
+from models.outbox_event import OutboxEvent
+from models.product import Product
+from models.sales_rollup import SalesRollup
+from services import outbox, rollups
+
+BATCH_SIZE = 5000
+REVENUE_TOLERANCE = 0.005
+ROLLUP_COLUMNS = ["day", "product_id", "vendor_id", "category", "units", "revenue", "order_lines"]
+# Outbox event types whose only effect is on the rollups
+ROLLUP_EVENTS = {
+    outbox.ORDER_CREATED: rollups.on_order_created,
+    outbox.ORDER_CANCELLED: rollups.on_order_cancelled,
+}
+
+
+def recompute():
+    """Select of ROLLUP_COLUMNS for every non-cancelled order, live or
+    archived, in (day, product_id) order. One statement, so an order moving
+    to the archive meanwhile is counted exactly once."""
+    lines = db.union_all(*[
+        db.select(order_model.created_at, details_model.product_id,
+                  details_model.quantity, details_model.unit_price)
+        .join(order_model, order_model.id == details_model.order_id)
+        .where(order_model.status != "Cancelled")
+        for order_model, details_model in ((Order, OrderDetails), (ArchivedOrder, ArchivedOrderDetails))
+    ]).subquery()
+    day = db.cast(lines.c.created_at, db.Date)
+    return db.select(
+        day.label("day"),
+        lines.c.product_id,
+        Product.vendor_id,
+        Product.category,
+        db.func.sum(lines.c.quantity).label("units"),
+        db.func.sum(lines.c.quantity * lines.c.unit_price).label("revenue"),
+        db.func.count().label("order_lines"),
+    ).select_from(lines) \
+        .outerjoin(Product, Product.id == lines.c.product_id) \
+        .group_by(day, lines.c.product_id, Product.vendor_id, Product.category) \
+        .order_by(day, lines.c.product_id)
+
+
+def _stream(stmt):
+    result = db.session.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+    try:
+        for row in result:
+            yield (row.day, row.product_id), (row.units, row.revenue, row.order_lines)
+    finally:
+        result.close()
+
+
+def compare():
+    """Merge the recompute with the stored rows (both in key order) and
+    print the differences; returns (recomputed rows, differences)."""
+    stored_stmt = db.select(SalesRollup.day, SalesRollup.product_id, SalesRollup.units,
+                            SalesRollup.revenue, SalesRollup.order_lines) \
+        .order_by(SalesRollup.day, SalesRollup.product_id)
+    expected, stored = _stream(recompute()), _stream(stored_stmt)
+    want, have = next(expected, None), next(stored, None)
+    rows = differences = 0
+    while want is not None or have is not None:
+        if have is None or (want is not None and want[0] < have[0]):
+            rows += 1
+            differences += 1
+            print(f"Missing {want[0][0]} product {want[0][1]}: expected {want[1]}")
+            want = next(expected, None)
+        elif want is None or have[0] < want[0]:
+            if have[1] != (0, 0.0, 0):
+                differences += 1
+                print(f"Mismatch {have[0][0]} product {have[0][1]}: stored {have[1]}, expected (0, 0.0, 0)")
+            have = next(stored, None)
+        else:
+            rows += 1
+            (units, revenue, lines), (want_units, want_revenue, want_lines) = have[1], want[1]
+            if units != want_units or lines != want_lines or abs(revenue - want_revenue) > REVENUE_TOLERANCE:
+                differences += 1
+                print(f"Mismatch {have[0][0]} product {have[0][1]}: stored {have[1]}, expected {want[1]}")
+            want, have = next(expected, None), next(stored, None)
+    return rows, differences
+
+
+def apply():
+    """Replace sales_rollups with the recompute while holding the outbox
+    dispatcher's lock, so no rollup event is applied during the swap."""
+    for event_type, consumer in ROLLUP_EVENTS.items():
+        if outbox.consumers(event_type) != [consumer]:
+            print(f"{event_type} has consumers besides the rollups; drain the outbox instead of rebuilding")
+            return False
+
+    with db.engine.connect() as connection:
+        # Session-level lock: dispatch batches (pg_try_advisory_xact_lock on
+        # the same key) skip until it is released, and any batch that held
+        # it has committed before we get it
+        connection.execute(db.text("SELECT pg_advisory_lock(:key)"), {"key": outbox.DISPATCH_LOCK_KEY})
+        connection.commit()
+        try:
+            # One snapshot for the recompute and the events it covers:
+            # an event is visible iff its order (same transaction) is
+            connection.execution_options(isolation_level="REPEATABLE READ")
+            with connection.begin():
+                connection.execute(db.delete(SalesRollup))
+                inserted = connection.execute(
+                    db.insert(SalesRollup).from_select(ROLLUP_COLUMNS, recompute().order_by(None))
+                ).rowcount
+                covered = connection.execute(
+                    db.update(OutboxEvent)
+                    .where(OutboxEvent.event_type.in_(list(ROLLUP_EVENTS)),
+                           OutboxEvent.status.in_(("pending", "failed")))
+                    .values(status="dispatched", dispatched_at=datetime.utcnow(),
+                            last_error="Counted by rebuild_sales_rollups.py")
+                ).rowcount
+        finally:
+            connection.execution_options(isolation_level="READ COMMITTED")
+            connection.execute(db.text("SELECT pg_advisory_unlock(:key)"), {"key": outbox.DISPATCH_LOCK_KEY})
+            connection.commit()
+    print(f"Replaced sales_rollups with {inserted} rows; {covered} pending order events were already counted")
+    return True
+
+
+if __name__ == "__main__":
+    with app.app_context():
+        rows, differences = compare()
+        print(f"{rows} rollup rows recomputed, {differences} differences")
+        if "--apply" in sys.argv[1:]:
+            if db.engine.dialect.name != "postgresql":
+                print("--apply needs PostgreSQL (the outbox dispatcher's advisory lock)")
+                sys.exit(1)
+            db.session.rollback()  # end the read transaction before taking the lock
+            sys.exit(0 if apply() else 1)
+        elif differences:
+            sys.exit(1)
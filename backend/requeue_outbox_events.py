@@ -0,0 +1,18 @@
+# backend/requeue_outbox_events.py
+# Put parked outbox events (status "failed", see services/outbox.py) back in
+# the queue once the consumer that rejected them is fixed. Later events of
+# the same orders are held back until these are delivered.
+#
+#   python requeue_outbox_events.py             # every parked event
+#   python requeue_outbox_events.py 12 15 ...   # only these event ids
+import sys
+
+from app import app, db
+from services.outbox import requeue_failed
+
+if __name__ == "__main__":
+    event_ids = [int(arg) for arg in sys.argv[1:]]
+    with app.app_context():
+        requeued = requeue_failed(event_ids or None)
+        db.session.commit()
+    print(f"Requeued {requeued} outbox events")
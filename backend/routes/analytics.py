@@ -0,0 +1,74 @@
+# backend/routes/analytics.py
+from app import app, db
+from models.sales_rollup import SalesRollup
+from services.rollups import ROLLUP_DIMENSIONS
+from flask import request, jsonify
+from datetime import date
+
+# 📈 Revenue and units sold, grouped by day/vendor/product/category (admin only)
+@app.route("/api/admin/analytics/sales", methods=["GET"])
+def get_sales_analytics():
+    try:
+        # TODO: Add proper admin authentication
+
+        group_by = [name.strip() for name in request.args.get('group_by', 'day').split(',') if name.strip()]
+        unknown = [name for name in group_by if name not in ROLLUP_DIMENSIONS]
+        if unknown or not group_by:
+            return jsonify({"error": f"group_by must be a comma-separated list of: {', '.join(ROLLUP_DIMENSIONS)}"}), 400
+
+        try:
+            date_from = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+            date_to = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+        except ValueError:
+            return jsonify({"error": "from and to must be ISO dates (YYYY-MM-DD)"}), 400
+
+        vendor_id = request.args.get('vendor_id')
+        if vendor_id:
+            try:
+                vendor_id = int(vendor_id)
+            except ValueError:
+                return jsonify({"error": "vendor_id must be an integer"}), 400
+
+        columns = [ROLLUP_DIMENSIONS[name].label(name) for name in group_by]
+        measures = [
+            db.func.sum(SalesRollup.units).label("units"),
+            db.func.sum(SalesRollup.revenue).label("revenue"),
+            db.func.sum(SalesRollup.order_lines).label("order_lines"),
+        ]
+
+        # Reads the rollups only; never touches orders or order_details
+        filters = []
+        if date_from:
+            filters.append(SalesRollup.day >= date_from)
+        if date_to:
+            filters.append(SalesRollup.day <= date_to)
+        if vendor_id:
+            filters.append(SalesRollup.vendor_id == vendor_id)
+        if request.args.get('category'):
+            filters.append(SalesRollup.category == request.args['category'])
+
+        stmt = db.select(*columns, *measures).where(*filters) \
+            .group_by(*columns).order_by(*columns)
+
+        rows = []
+        totals = {"units": 0, "revenue": 0.0, "order_lines": 0}
+        for row in db.session.execute(stmt):
+            entry = {name: getattr(row, name) for name in group_by}
+            if "day" in entry:
+                entry["day"] = entry["day"].isoformat()
+            entry["units"] = int(row.units or 0)
+            entry["revenue"] = round(row.revenue or 0.0, 2)
+            entry["order_lines"] = int(row.order_lines or 0)
+            # Fully reversed groups (all orders cancelled) carry no information
+            if entry["units"] == 0 and entry["order_lines"] == 0:
+                continue
+            for key in totals:
+                totals[key] += entry[key]
+            rows.append(entry)
+        totals["revenue"] = round(totals["revenue"], 2)
+
+        return jsonify({"group_by": group_by, "totals": totals, "rows": rows}), 200
+
+    except Exception as e:
+        print(f"Error fetching sales analytics: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
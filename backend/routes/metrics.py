@@ -0,0 +1,27 @@
+# backend/routes/metrics.py
+from app import app
+from services.cache import catalog_cache
+from services.compression import response_compressor
+from services.holds import hold_index, hold_sweeper
+from services.idempotency import idempotency_store
+from services.outbox import outbox_dispatcher
+from services.stock_shards import shard_rebalancer
+from services.stream_hub import product_stream_hub
+from flask import jsonify
+
+# 📊 In-process counters for this worker (plus the shared outbox backlog)
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    try:
+        return jsonify({
+            "catalog_cache": catalog_cache.stats(),
+            "compression": response_compressor.stats(),
+            "idempotency": idempotency_store.stats(),
+            "outbox": outbox_dispatcher.stats(),
+            "stock_holds": dict(hold_index.stats(), swept=hold_sweeper.swept),
+            "product_streams": product_stream_hub.stats(),
+            "stock_shards": {"rebalanced": shard_rebalancer.rebalanced}
+        }), 200
+    except Exception as e:
+        print(f"Error fetching metrics: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
@@ -1,13 +1,28 @@
 from app import app, db
 from models.order import Order
 from models.order_details import OrderDetails
+from models.order_archive import ArchivedOrder
 from models.payment import Payment
-from models.product import Product
 from flask import request, jsonify
 import requests
+from services import catalog_events
+from services.fields import parse_fields
+from services import outbox
+from services.holds import hold_index, release_holds
+from services.idempotency import idempotent, record_response
+from services.outbox import outbox_dispatcher
+from services.stock import StockError, parse_order_items, reserve_stock, restore_stock_for_orders
+from services.orders import (
+    ORDER_FIELDS, ORDER_STATUSES, ORDER_SUMMARY_FIELDS, TERMINAL_ORDER_STATUSES,
+    order_to_dict, order_columns, order_load_options,
+    order_details_options, order_line_items, order_summary,
+    parse_order_filters, apply_order_filters, order_history
+)
+from services.pagination import parse_limit, encode_cursor, decode_cursor
 
 # 🚀 1. Create a new Order (with payment ID)
 @app.route("/api/order/create", methods=["POST"])
+@idempotent("order.create")
 def create_order():
     try:
         data = request.get_json()
@@ -27,27 +42,29 @@ def create_order():
         if payment.username != data["username"]:
             return jsonify({"error": "Payment does not belong to the user"}), 400
 
-        # Validate product stock before creating order
+        # Validate products and reserve stock. The order, its line items and
+        # the stock decrements commit together, so a failed checkout leaves
+        # nothing behind and concurrent checkouts cannot oversell. Units held
+        # by other carts are off limits; the cart's own holds (hold_token)
+        # are consumed by this order.
         ordered_products = data["products"]
-        for product_item in ordered_products:
-            product_id = product_item.get("product_id")
-            quantity = product_item.get("quantity")
-            
-            if not product_id or not quantity:
-                return jsonify({"error": "Each product must have product_id and quantity"}), 400
-            
-            # Check product availability
-            product = Product.query.get(product_id)
-            if not product:
-                return jsonify({"error": f"Product with ID {product_id} not found"}), 400
-            
-            if not product.active:
-                return jsonify({"error": f"Product {product.name} is no longer available"}), 400
-            
-            if product.stock < quantity:
-                return jsonify({
-                    "error": f"Insufficient stock for product {product.name}. Available: {product.stock}"
-                }), 400
+        hold_token = data.get("hold_token")
+        try:
+            quantities = parse_order_items(ordered_products)
+            reserved = reserve_stock(quantities, hold_token)
+        except StockError as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 400
+
+        # Line items in request order, with the summary shown in order lists
+        line_items = [
+            (int(item.get("product_id")), int(item.get("quantity")), item.get("unit_price"))
+            for item in ordered_products
+        ]
+        summary = order_summary([
+            (product_id, quantity, reserved[product_id].name, reserved[product_id].image_url)
+            for product_id, quantity, _ in line_items
+        ])
 
         # Create Order
         new_order = Order(
@@ -65,36 +82,41 @@ def create_order():
             sales_tax_amount=data["sales_tax_amount"],
             shipping_fee=data["shipping_fee"],
             total_amount=data["total_amount"],
-            payment_id=payment_id
+            payment_id=payment_id,
+            **summary
         )
         db.session.add(new_order)
-        db.session.commit()  # Save order to get ID
-
-        # Create OrderDetails and update product stock
-        for product_item in ordered_products:
-            product_id = product_item.get("product_id")
-            quantity = product_item.get("quantity")
-            unit_price = product_item.get("unit_price")
+        db.session.flush()  # Assign the order ID without committing
 
-            # Create order detail
-            order_detail = OrderDetails(
+        # Create OrderDetails
+        for product_id, quantity, unit_price in line_items:
+            db.session.add(OrderDetails(
                 order_id=new_order.id,
                 product_id=product_id,
                 quantity=quantity,
                 unit_price=unit_price
-            )
-            db.session.add(order_detail)
-            
-            # Update product stock
-            product = Product.query.get(product_id)
-            product.stock -= quantity
-
-        db.session.commit()
+            ))
+        db.session.flush()
+        outbox.record_order_created(new_order, quantities)
+        if hold_token:
+            release_holds(hold_token)
 
-        return jsonify({
+        response_body = {
             "message": "Order created successfully", 
             "order_id": new_order.id
-        }), 201
+        }
+        # Commits with the order, so a retry replays it instead of reordering
+        record_response(response_body, 201)
+        db.session.commit()
+        if hold_token:
+            hold_index.replace_token(hold_token, {})
+        outbox_dispatcher.wake()
+        catalog_events.stock_changed(
+            reserved.values(), {product_id: -quantity for product_id, quantity in quantities.items()}
+        )
+        catalog_events.sales_recorded(quantities)
+
+        return jsonify(response_body), 201
 
     except Exception as e:
         db.session.rollback()
@@ -110,8 +132,23 @@ def get_orders():
         order_id = request.args.get('order_id')
 
         if order_id:
-            # Get specific order by ID
-            order = Order.query.get(order_id)
+            try:
+                fields = parse_fields(request.args.get('fields'), ORDER_FIELDS) or ORDER_FIELDS
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            # Get specific order by ID (line items and their products are
+            # eager-loaded only when requested)
+            order = None
+            for model in (Order, ArchivedOrder):
+                # Old Delivered/Cancelled orders are moved to the archive
+                # tables by archive_orders.py
+                options = order_load_options(fields, required=("id", "username"), model=model)
+                if "products" in fields:
+                    options += order_details_options(model)
+                order = model.query.options(*options).get(order_id)
+                if order:
+                    break
             if not order:
                 return jsonify({"error": "Order not found"}), 404
             
@@ -119,81 +156,58 @@ def get_orders():
             if username and order.username != username:
                 return jsonify({"error": "You don't have permission to view this order"}), 403
             
-            order_details = OrderDetails.query.filter_by(order_id=order.id).all()
-            details_list = []
-            
-            for d in order_details:
-                # Get product info
-                product = Product.query.get(d.product_id)
-                product_name = product.name if product else "Unknown Product"
-                product_image = product.image_url if product else None
-                
-                details_list.append({
-                    "product_id": d.product_id,
-                    "product_name": product_name,
-                    "product_image": product_image,
-                    "quantity": d.quantity,
-                    "unit_price": d.unit_price,
-                    "subtotal": d.quantity * d.unit_price
-                })
-            
-            order_data = {
-                "id": order.id,
-                "username": order.username,
-                "payment_id": order.payment_id,
-                "first_name": order.first_name,
-                "last_name": order.last_name,
-                "address1": order.address1,
-                "address2": order.address2,
-                "country": order.country,
-                "state": order.state,
-                "city": order.city,
-                "zip_code": order.zip_code,
-                "phone_number": order.phone_number,
-                "subtotal_amount": order.subtotal_amount,
-                "sales_tax_amount": order.sales_tax_amount,
-                "shipping_fee": order.shipping_fee,
-                "total_amount": order.total_amount,
-                "status": order.status,
-                "created_at": order.created_at,
-                "products": details_list
-            }
+            order_data = order_to_dict(order, fields)
+
+            if "products" in fields:
+                order_data["products"] = order_line_items(order)
             
             return jsonify(order_data), 200
-            
-        elif username:
-            # Get all orders for username
-            orders = Order.query.filter_by(username=username).order_by(Order.created_at.desc()).all()
+
+        try:
+            fields = parse_fields(request.args.get('fields'), ORDER_SUMMARY_FIELDS) or ORDER_SUMMARY_FIELDS
+            filters = parse_order_filters(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Paginate only when asked so existing callers keep getting a list
+        cursor = request.args.get('cursor')
+        paginated = cursor is not None or request.args.get('limit') is not None
+        after = None
+        if paginated:
+            try:
+                limit = parse_limit(request.args.get('limit'))
+                after = decode_cursor(cursor, "orders") if cursor else None
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        def select_orders(model):
+            select = db.select(*order_columns(fields, required=("id", "created_at"), model=model))
+            select = apply_order_filters(select, filters, model)
+            if username:
+                # Get orders for username
+                select = select.where(model.username == username)
+            return select
+
+        # A user's history includes their archived orders; the unfiltered
+        # list (admin only) covers live orders
+        # TODO: Add admin authentication check
+        models = (Order, ArchivedOrder) if username else (Order,)
+        if paginated:
+            # Fetch one extra row to know whether there is a next page
+            orders = order_history(select_orders, after, limit + 1, models)
+            has_more = len(orders) > limit
+            orders = orders[:limit]
         else:
-            # Get all orders (admin only)
-            # TODO: Add admin authentication check
-            orders = Order.query.order_by(Order.created_at.desc()).all()
-
-        order_list = []
-        for order in orders:
-            order_details = OrderDetails.query.filter_by(order_id=order.id).all()
-            details_list = [
-                {
-                    "product_id": d.product_id,
-                    "quantity": d.quantity,
-                    "unit_price": d.unit_price
-                }
-                for d in order_details
-            ]
-
-            order_data = {
-                "id": order.id,
-                "username": order.username,
-                "payment_id": order.payment_id,
-                "first_name": order.first_name,
-                "last_name": order.last_name,
-                "status": order.status,
-                "total_amount": order.total_amount,
-                "created_at": order.created_at,
-                "product_count": len(details_list)
-            }
-
-            order_list.append(order_data)
+            orders = order_history(select_orders, models=models)
+
+        order_list = [order_to_dict(order, fields) for order in orders]
+
+        if paginated:
+            next_cursor = None
+            if has_more:
+                last = orders[-1]
+                next_cursor = encode_cursor("orders", [last.created_at, last.id])
+            return jsonify({"orders": order_list, "next_cursor": next_cursor}), 200
 
         return jsonify(order_list), 200
 
@@ -212,7 +226,8 @@ def cancel_order():
         if not order_id:
             return jsonify({"error": "Order ID is required"}), 400
 
-        order = Order.query.get(order_id)
+        # Lock the order so concurrent cancels/status changes serialize
+        order = Order.query.filter_by(id=order_id).with_for_update().first()
 
         if not order:
             return jsonify({"error": "Order not found"}), 404
@@ -226,17 +241,16 @@ def cancel_order():
             return jsonify({"error": f"Cannot cancel order with status '{order.status}'"}), 400
 
         # Update order status
+        outbox.record_status_change(order.id, order.status, "Cancelled")
         order.status = "Cancelled"
         
         # Restore product stock
-        order_details = OrderDetails.query.filter_by(order_id=order.id).all()
-        
-        for detail in order_details:
-            product = Product.query.get(detail.product_id)
-            if product:
-                product.stock += detail.quantity
+        restored_products, restored_units = restore_stock_for_orders([order.id])
         
         db.session.commit()
+        outbox_dispatcher.wake()
+        catalog_events.stock_changed(restored_products, restored_units)
+        catalog_events.sales_recorded({product_id: -units for product_id, units in restored_units.items()})
 
         return jsonify({"message": "Order cancelled successfully"}), 200
 
@@ -259,33 +273,129 @@ def update_order_status():
             return jsonify({"error": "Order ID and status are required"}), 400
         
         # Validate status value
-        valid_statuses = ["Pending", "Processing", "Shipped", "Delivered", "Cancelled"]
-        if new_status not in valid_statuses:
+        if new_status not in ORDER_STATUSES:
             return jsonify({"error": "Invalid status value"}), 400
         
-        order = Order.query.get(order_id)
+        # Lock the order so concurrent cancels/status changes serialize
+        order = Order.query.filter_by(id=order_id).with_for_update().first()
         
         if not order:
             return jsonify({"error": "Order not found"}), 404
         
         # TODO: Add role-based authorization check (vendor/admin)
+
+        # Delivered and Cancelled are final (leaving Cancelled would restore
+        # the stock a second time on the next cancel)
+        if order.status in TERMINAL_ORDER_STATUSES and new_status != order.status:
+            return jsonify({"error": f"Cannot change status of order with status '{order.status}'"}), 400
         
         # If new status is "Cancelled", restore product stock
+        restored_products, restored_units = [], {}
         if new_status == "Cancelled" and order.status != "Cancelled":
-            order_details = OrderDetails.query.filter_by(order_id=order.id).all()
-            
-            for detail in order_details:
-                product = Product.query.get(detail.product_id)
-                if product:
-                    product.stock += detail.quantity
+            restored_products, restored_units = restore_stock_for_orders([order.id])
         
         # Update order status
+        if new_status != order.status:
+            outbox.record_status_change(order.id, order.status, new_status)
         order.status = new_status
         db.session.commit()
+        outbox_dispatcher.wake()
+        catalog_events.stock_changed(restored_products, restored_units)
+        catalog_events.sales_recorded({product_id: -units for product_id, units in restored_units.items()})
         
         return jsonify({"message": f"Order status updated to {new_status}"}), 200
     
     except Exception as e:
         db.session.rollback()
         print(f"Error updating order status: {str(e)}")
-        return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
+        return jsonify({"error": "Internal server error"}), 500
+
+BULK_STATUS_MAX = 500
+
+# 📦 5. Update the status of many orders in one transaction (vendors/admin)
+@app.route("/api/order/update-status/bulk", methods=["PUT"])
+def bulk_update_order_status():
+    try:
+        data = request.get_json() or {}
+
+        # Either {"updates": [{"order_id", "status"}, ...]} or
+        # {"order_ids": [...], "status": "..."} for one target status
+        updates = data.get("updates")
+        if updates is None and "order_ids" in data:
+            updates = [{"order_id": order_id, "status": data.get("status")} for order_id in data["order_ids"]]
+        if not isinstance(updates, list) or not updates:
+            return jsonify({"error": "updates (or order_ids and status) are required"}), 400
+        if len(updates) > BULK_STATUS_MAX:
+            return jsonify({"error": f"At most {BULK_STATUS_MAX} orders per request"}), 400
+
+        # TODO: Add role-based authorization check (vendor/admin)
+
+        results = {}
+        targets = {}  # order_id -> requested status
+        for update in updates:
+            try:
+                order_id = int(update.get("order_id"))
+            except (AttributeError, TypeError, ValueError):
+                return jsonify({"error": "Each update must have an integer order_id"}), 400
+            status = update.get("status")
+            if order_id in targets or order_id in results:
+                results[order_id] = {"order_id": order_id, "result": "rejected", "error": "Duplicate order_id"}
+                targets.pop(order_id, None)
+            elif status not in ORDER_STATUSES:
+                results[order_id] = {"order_id": order_id, "result": "rejected", "error": "Invalid status value"}
+            else:
+                targets[order_id] = status
+
+        # Lock the orders so concurrent transitions of the same orders serialize
+        current = dict(db.session.execute(
+            db.select(Order.id, Order.status).where(Order.id.in_(targets)).order_by(Order.id).with_for_update()
+        ).all())
+
+        by_status = {}  # new status -> [order_id, ...]
+        for order_id, status in targets.items():
+            previous = current.get(order_id)
+            if previous is None:
+                results[order_id] = {"order_id": order_id, "result": "rejected", "error": "Order not found"}
+            elif previous == status:
+                results[order_id] = {"order_id": order_id, "result": "unchanged", "status": status}
+            elif previous in TERMINAL_ORDER_STATUSES:
+                results[order_id] = {
+                    "order_id": order_id, "result": "rejected",
+                    "error": f"Cannot change status of order with status '{previous}'"
+                }
+            else:
+                by_status.setdefault(status, []).append(order_id)
+                results[order_id] = {"order_id": order_id, "result": "updated", "from": previous, "status": status}
+
+        # One aggregated stock restore for every order being cancelled
+        restored_products, restored_units = restore_stock_for_orders(by_status.get("Cancelled", []))
+
+        for status, order_ids in by_status.items():
+            db.session.execute(
+                db.update(Order).where(Order.id.in_(order_ids)).values(status=status)
+                .execution_options(synchronize_session=False)
+            )
+            for order_id in order_ids:
+                outbox.record_status_change(order_id, current[order_id], status)
+
+        db.session.commit()
+        outbox_dispatcher.wake()
+        catalog_events.stock_changed(restored_products, restored_units)
+        catalog_events.sales_recorded({product_id: -units for product_id, units in restored_units.items()})
+
+        ordered_results = []
+        for update in updates:
+            result = results.pop(int(update.get("order_id")), None)
+            if result is not None:
+                ordered_results.append(result)
+
+        return jsonify({
+            "updated": sum(len(order_ids) for order_ids in by_status.values()),
+            "rejected": sum(1 for result in ordered_results if result["result"] == "rejected"),
+            "results": ordered_results
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error bulk updating order status: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
@@ -3,8 +3,10 @@ from models.order import Order
 from models.order_details import OrderDetails
 from models.payment import Payment
 from flask import request, jsonify
+from services.idempotency import idempotent, record_response
 
 @app.route("/api/payment/create", methods=["POST"])
+@idempotent("payment.create")
 def create_payment():
     try:
         data = request.get_json()
@@ -29,12 +31,16 @@ def create_payment():
         )
 
         db.session.add(new_payment)
-        db.session.commit()
+        db.session.flush()
 
-        return jsonify({
+        response_body = {
             "message": "Payment created successfully",
             "payment_id": new_payment.id
-        }), 201
+        }
+        record_response(response_body, 201)
+        db.session.commit()
+
+        return jsonify(response_body), 201
 
     except Exception as e:
         db.session.rollback()
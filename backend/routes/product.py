@@ -1,32 +1,101 @@
 from app import app, db
 from models.product import Product
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
+from datetime import datetime
+import csv
+import io
+import json
+from services.catalog import (
+    PRODUCT_SORTS, DEFAULT_PRODUCT_SORT, PRODUCT_FIELDS, EXPORT_COLUMNS, product_to_dict,
+    product_load_options, parse_product_filters, apply_product_filters, apply_product_sort,
+    product_sort_key, iter_export_batches, compute_facets
+)
+from services.fields import parse_fields, project
+from services.pagination import parse_limit, encode_cursor, decode_cursor
+from services.search_index import product_search_index
+from services.suggest_index import product_suggest_index
+from services.cache import catalog_cache
+from services.http_cache import make_etag, conditional_json
+from services.compression import cache_compressed
+from services import catalog_events
 
 @app.route("/api/product/list", methods=["GET"])
+@cache_compressed
 def get_all_products():
     try:
-        # Only get active products by default
-        products = Product.query.filter_by(active=True).all()
-        product_list = [
-            {
-                "id": product.id,
-                "name": product.name,
-                "price": product.price,
-                "rating": product.rating,
-                "image_url": product.image_url,
-                "vendor_id": product.vendor_id,
-                "stock": product.stock,
-                "description": product.description,
-                "category": product.category,
-                "active": product.active
+        try:
+            filters = parse_product_filters(request.args)
+            fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        sort = request.args.get('sort', DEFAULT_PRODUCT_SORT)
+        if sort not in PRODUCT_SORTS:
+            return jsonify({"error": f"sort must be one of: {', '.join(PRODUCT_SORTS)}"}), 400
+
+        cursor = request.args.get('cursor')
+        paginated = cursor is not None or request.args.get('limit') is not None
+        if paginated:
+            try:
+                limit = parse_limit(request.args.get('limit'))
+                after = decode_cursor(cursor, sort) if cursor else None
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        def load_products():
+            # Only get active products by default
+            query = apply_product_filters(Product.query, filters).options(*product_load_options(fields))
+
+            if not paginated:
+                # Legacy un-paginated response (plain list) for existing callers
+                products = apply_product_sort(query, sort).all()
+                body = [product_to_dict(product, fields) for product in products]
+            else:
+                # Fetch one extra row to know whether there is a next page
+                products = apply_product_sort(query, sort, after).limit(limit + 1).all()
+                has_more = len(products) > limit
+                products = products[:limit]
+
+                next_cursor = None
+                if has_more:
+                    next_cursor = encode_cursor(sort, product_sort_key(products[-1], sort))
+
+                body = {
+                    "products": [product_to_dict(product, fields) for product in products],
+                    "next_cursor": next_cursor
+                }
+
+            # The ETag covers exactly the rows in the body, so a changed,
+            # added or removed product changes it. No Last-Modified: the
+            # newest updated_at in the body does not move when a product is
+            # deleted or deactivated, so If-Modified-Since would get a stale 304
+            versions = [(product.id, product.updated_at) for product in products]
+            return {
+                "body": body,
+                "etag": make_etag("list", versions),
+                "last_modified": None
             }
-            for product in products
-        ]
-        return jsonify(product_list), 200
+
+        cache_key = ("product_list", tuple(sorted(request.args.items(multi=True))))
+        page = catalog_cache.get_or_load(cache_key, [("catalog",)], load_products)
+        return conditional_json(page["body"], page["etag"], page["last_modified"])
     except Exception as e:
         print(f"Error fetching products: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+BATCH_DETAILS_MAX = 100
+DEFAULT_PRICE_BUCKET = 25.0
+MAX_SUGGESTIONS = 20
+
+
+def product_cache_entry(product):
+    # Shape cached under ("product_details", id): body plus its validators
+    return {
+        "body": product_to_dict(product),
+        "etag": make_etag("product", product.id, product.updated_at),
+        "last_modified": product.updated_at
+    }
+
 @app.route("/api/product/details", methods=["GET"])
 def get_product_details():
     try:
@@ -34,30 +103,236 @@ def get_product_details():
 
         if not product_id:
             return jsonify({"error": "Product ID is required"}), 400
-        
-        product = Product.query.get(product_id)
 
-        if not product:
+        try:
+            product_id = int(product_id)
+        except ValueError:
+            return jsonify({"error": "Product ID must be an integer"}), 400
+
+        try:
+            fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        def load_product():
+            product = Product.query.get(product_id)
+            return product_cache_entry(product) if product else None
+
+        # Conditional requests on a warm cache are answered without a query
+        cached = catalog_cache.get_or_load(
+            ("product_details", product_id), [("product", product_id)], load_product
+        )
+
+        if not cached:
             return jsonify({"error": "Product not found"}), 404
         
-        product_data = {
-            "id": product.id,
-            "name": product.name,
-            "price": product.price,
-            "rating": product.rating,
-            "image_url": product.image_url,
-            "vendor_id": product.vendor_id,
-            "stock": product.stock,
-            "description": product.description,
-            "category": product.category,
-            "active": product.active
-        }
-        return jsonify(product_data), 200
+        # The cache holds the full row; a fieldset is projected from it and
+        # gets its own ETag since it is a different representation
+        if fields is None:
+            return conditional_json(cached["body"], cached["etag"], cached["last_modified"])
+        return conditional_json(
+            project(cached["body"], fields), make_etag(cached["etag"], fields), cached["last_modified"]
+        )
     except Exception as e:
         print(f"Error fetching product details: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
     
 
+# 📦 Resolve many products at once (cart, wishlist, order pages)
+@app.route("/api/product/details/batch", methods=["GET", "POST"])
+def get_product_details_batch():
+    try:
+        if request.method == "POST":
+            raw_ids = (request.get_json(silent=True) or {}).get('ids')
+        else:
+            raw_ids = [i for i in request.args.get('ids', '').split(',') if i.strip()]
+
+        if not isinstance(raw_ids, list) or not raw_ids:
+            return jsonify({"error": "A non-empty list of product ids is required"}), 400
+
+        try:
+            # De-duplicate while keeping the caller's order
+            product_ids = list(dict.fromkeys(int(i) for i in raw_ids))
+        except (TypeError, ValueError):
+            return jsonify({"error": "Product ids must be integers"}), 400
+
+        if len(product_ids) > BATCH_DETAILS_MAX:
+            return jsonify({"error": f"At most {BATCH_DETAILS_MAX} product ids per request"}), 400
+
+        try:
+            fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        def load_products(keys):
+            # All cache misses in a single WHERE id IN (...) query
+            missing_ids = [product_id for _, product_id in keys]
+            products = Product.query.filter(Product.id.in_(missing_ids)).all()
+            return {("product_details", p.id): product_cache_entry(p) for p in products}
+
+        entries = catalog_cache.get_many(
+            {("product_details", product_id): [("product", product_id)] for product_id in product_ids},
+            load_products
+        )
+
+        found = []
+        missing = []
+        for product_id in product_ids:
+            entry = entries[("product_details", product_id)]
+            if entry:
+                found.append(project(entry["body"], fields))
+            else:
+                missing.append(product_id)
+
+        return jsonify({
+            "products": found,
+            "missing": missing
+        }), 200
+    except Exception as e:
+        print(f"Error fetching product details batch: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
+# 📊 Category/vendor counts and price histogram for the current filter
+@app.route("/api/product/facets", methods=["GET"])
+@cache_compressed
+def get_product_facets():
+    try:
+        try:
+            filters = parse_product_filters(request.args)
+            bucket_width = float(request.args.get('price_bucket', DEFAULT_PRICE_BUCKET))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if bucket_width <= 0:
+            return jsonify({"error": "price_bucket must be positive"}), 400
+
+        # Cached per filter signature; product writes bump the catalog scope
+        # (stock moves only when a product goes in or out of stock)
+        cache_key = ("product_facets", tuple(sorted(filters.items())), bucket_width)
+        facets = catalog_cache.get_or_load(
+            cache_key, [("catalog",)], lambda: compute_facets(filters, bucket_width)
+        )
+        return jsonify(facets), 200
+    except Exception as e:
+        print(f"Error computing product facets: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
+# 🔍 Full-text product search
+@app.route("/api/product/search", methods=["GET"])
+def search_products():
+    try:
+        query_text = request.args.get('q', '').strip()
+        if not query_text:
+            return jsonify({"error": "Search query (q) is required"}), 400
+
+        try:
+            filters = parse_product_filters(request.args)
+            fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
+            limit = parse_limit(request.args.get('limit'))
+            offset = max(0, int(request.args.get('offset', 0)))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        product_search_index.ensure_built()
+        total, hits = product_search_index.search(query_text, filters, limit=limit, offset=offset)
+
+        # Load the page of hits in one query and keep the ranking order
+        ids = [product_id for product_id, _ in hits]
+        products_by_id = {}
+        if ids:
+            query = Product.query.filter(Product.id.in_(ids)).options(*product_load_options(fields))
+            products_by_id = {p.id: p for p in query.all()}
+        results = []
+        for product_id, score in hits:
+            product = products_by_id.get(product_id)
+            if product is not None:
+                product_data = product_to_dict(product, fields)
+                product_data["score"] = round(score, 4)
+                results.append(product_data)
+
+        return jsonify({
+            "query": query_text,
+            "total": total,
+            "products": results
+        }), 200
+    except Exception as e:
+        print(f"Error searching products: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
+# ⌨️ Suggest-as-you-type over product names and categories
+@app.route("/api/product/suggest", methods=["GET"])
+def suggest_products():
+    try:
+        query_text = request.args.get('q', '')
+        try:
+            limit = parse_limit(request.args.get('limit'), default=8, maximum=MAX_SUGGESTIONS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        product_suggest_index.ensure_built()
+        return jsonify({
+            "query": query_text,
+            "suggestions": product_suggest_index.suggest(query_text, limit=limit)
+        }), 200
+    except Exception as e:
+        print(f"Error suggesting products: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
+# 📤 Stream the whole catalog as NDJSON or CSV (nightly search/analytics sync)
+@app.route("/api/product/export", methods=["GET"])
+def export_products():
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ("ndjson", "csv"):
+            return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+
+        try:
+            filters = parse_product_filters(request.args, allow_inactive=True)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        column_names = [column.key for column in EXPORT_COLUMNS]
+
+        def export_value(value):
+            return value.isoformat() if isinstance(value, datetime) else value
+
+        def generate_ndjson():
+            for batch in iter_export_batches(filters):
+                yield "".join(
+                    json.dumps(dict(zip(column_names, map(export_value, row)))) + "\n"
+                    for row in batch
+                )
+
+        def generate_csv():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(column_names)
+            for batch in iter_export_batches(filters):
+                writer.writerows([map(export_value, row) for row in batch])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            # Header-only export when nothing matched
+            if buffer.tell():
+                yield buffer.getvalue()
+
+        if export_format == "csv":
+            body, mimetype = generate_csv(), "text/csv"
+        else:
+            body, mimetype = generate_ndjson(), "application/x-ndjson"
+
+        response = Response(stream_with_context(body), mimetype=mimetype)
+        response.headers["Content-Disposition"] = f"attachment; filename=products.{export_format}"
+        return response
+    except Exception as e:
+        print(f"Error exporting products: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
 @app.route("/api/product/add-products", methods=["POST"])
 def add_products_bulk():
     try:
@@ -95,7 +370,9 @@ def add_products_bulk():
             products_to_add.append(new_product)
 
         db.session.add_all(products_to_add)
+        saved = catalog_events.snapshot(products_to_add)
         db.session.commit()
+        catalog_events.products_saved(saved)
 
         return jsonify({"message": f"{len(products_to_add)} products added successfully."}), 201
 
@@ -109,6 +386,7 @@ def delete_all_products():
     try:
         num_deleted = db.session.query(Product).delete()
         db.session.commit()
+        catalog_events.catalog_cleared()
 
         return jsonify({"message": f"Deleted {num_deleted} products successfully."}), 200
 
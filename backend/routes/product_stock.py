@@ -1,7 +1,18 @@
 # backend/routes/product_stock.py
+import json
+import time
+
 from app import app, db
 from models.product import Product
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
+from services import catalog_events
+from services.holds import hold_index, place_holds, release_holds
+from services.stock import apply_stock_deltas, stock_levels
+from services.stock_shards import effective_stock
+from services.stream_hub import product_stream_hub
+
+MAX_STREAM_PRODUCTS = 200
+STREAM_KEEPALIVE_SECONDS = 15
 
 # 🚀 Verify product stock for multiple products at once (used by cart)
 @app.route("/api/product/verify-stock", methods=["POST"])
@@ -12,56 +23,63 @@ def verify_product_stock():
         if not data or not isinstance(data.get('items'), list):
             return jsonify({"error": "Invalid request format"}), 400
         
+        # Sum quantities per product so a product listed on several cart
+        # lines is checked against its total
         cart_items = data.get('items')
         result = []
-        
+        requested = {}
         for item in cart_items:
             product_id = item.get('id')
             requested_quantity = item.get('quantity', 1)
-            
+
+            try:
+                product_id = int(product_id)
+            except (TypeError, ValueError):
+                product_id = None
             if not product_id:
                 result.append({
-                    "id": product_id,
+                    "id": item.get('id'),
                     "valid": False,
                     "reason": "invalid_product"
                 })
                 continue
-            
-            # Get product from database
-            product = Product.query.get(product_id)
-            
-            if not product:
-                result.append({
-                    "id": product_id,
-                    "valid": False,
-                    "reason": "product_not_found"
-                })
-                continue
-            
-            if not product.active:
+
+            if not isinstance(requested_quantity, int) or requested_quantity < 1:
                 result.append({
                     "id": product_id,
                     "valid": False,
-                    "reason": "product_inactive",
-                    "available_stock": product.stock
+                    "reason": "invalid_quantity"
                 })
                 continue
-            
-            if product.stock < requested_quantity:
+
+            requested[product_id] = requested.get(product_id, 0) + requested_quantity
+
+        # One query for the whole cart. Units held by other carts are not
+        # available; the caller's own holds (hold_token) are.
+        levels = stock_levels(list(requested))
+        hold_index.ensure_fresh()
+        held = hold_index.held(list(levels), exclude_token=data.get('hold_token'))
+
+        for product_id, requested_quantity in requested.items():
+            if product_id not in levels:
                 result.append({
                     "id": product_id,
                     "valid": False,
-                    "reason": "insufficient_stock",
-                    "available_stock": product.stock
+                    "reason": "product_not_found"
                 })
                 continue
-            
-            # Product is valid
-            result.append({
-                "id": product_id,
-                "valid": True,
-                "available_stock": product.stock
-            })
+
+            stock, active = levels[product_id]
+            available = max(stock - held[product_id], 0)
+            entry = {"id": product_id, "requested_quantity": requested_quantity, "available_stock": available}
+
+            if not active:
+                entry.update(valid=False, reason="product_inactive")
+            elif available < requested_quantity:
+                entry.update(valid=False, reason="insufficient_stock")
+            else:
+                entry["valid"] = True
+            result.append(entry)
         
         return jsonify({
             "items": result,
@@ -72,61 +90,208 @@ def verify_product_stock():
         print(f"Error verifying product stock: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
-# 🛠️ Update product stock after order placement
-@app.route("/api/product/update-stock", methods=["POST"])
-def update_product_stock():
+# 🔒 Hold stock for a cart for STOCK_HOLD_MINUTES (all or nothing). Sending
+# the returned hold_token again replaces the cart's holds; passing it to
+# /api/order/create consumes them.
+@app.route("/api/cart/hold", methods=["POST"])
+def hold_cart_stock():
     try:
         data = request.get_json()
-        
-        if not data or not isinstance(data.get('items'), list):
+
+        if not data or not isinstance(data.get('items'), list) or not data.get('items'):
             return jsonify({"error": "Invalid request format"}), 400
-        
-        ordered_items = data.get('items')
-        success_count = 0
-        failed_items = []
-        
-        for item in ordered_items:
+
+        hold_token = data.get('hold_token')
+        if hold_token is not None and (not isinstance(hold_token, str) or len(hold_token) > 64):
+            return jsonify({"error": "Invalid hold_token"}), 400
+
+        quantities = {}
+        for item in data.get('items'):
             product_id = item.get('id')
-            ordered_quantity = item.get('quantity', 1)
-            
-            if not product_id or ordered_quantity < 1:
-                failed_items.append({
-                    "id": product_id,
-                    "reason": "invalid_item_data"
-                })
-                continue
-            
-            # Get product from database
-            product = Product.query.get(product_id)
-            
-            if not product:
+            quantity = item.get('quantity', 1)
+            try:
+                product_id = int(product_id)
+            except (TypeError, ValueError):
+                product_id = None
+            if not product_id or not isinstance(quantity, int) or quantity < 1:
+                return jsonify({"error": "Each item must have an id and a positive integer quantity"}), 400
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+        hold_token, expires_at, failures = place_holds(quantities, hold_token, data.get('username'))
+        if failures:
+            db.session.rollback()
+            return jsonify({"error": "Some items could not be held", "failed_items": failures}), 409
+
+        db.session.commit()
+        hold_index.replace_token(hold_token, {
+            product_id: (quantity, expires_at) for product_id, quantity in quantities.items()
+        })
+
+        return jsonify({
+            "hold_token": hold_token,
+            "expires_at": expires_at.isoformat(),
+            "items": [{"id": product_id, "quantity": quantity} for product_id, quantity in quantities.items()]
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error holding cart stock: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+# 🔓 Release a cart's holds (cart emptied or abandoned)
+@app.route("/api/cart/hold", methods=["DELETE"])
+def release_cart_stock():
+    try:
+        hold_token = request.args.get('hold_token')
+        if not hold_token:
+            return jsonify({"error": "hold_token is required"}), 400
+
+        release_holds(hold_token)
+        db.session.commit()
+        hold_index.replace_token(hold_token, {})
+
+        return jsonify({"message": "Hold released"}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error releasing cart stock: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# 📡 Stream stock/price/active changes for a set of products (server-sent
+# events), so open carts do not have to poll verify-stock. The first event
+# is a snapshot; after that only changed fields are sent. The stream ends
+# after STREAM_MAX_SECONDS and EventSource reconnects on its own.
+@app.route("/api/product/stream", methods=["GET"])
+def stream_products():
+    try:
+        try:
+            product_ids = {int(product_id) for product_id in request.args.get('ids', '').split(',') if product_id.strip()}
+        except ValueError:
+            return jsonify({"error": "ids must be a comma-separated list of product ids"}), 400
+        if not product_ids:
+            return jsonify({"error": "ids is required"}), 400
+        if len(product_ids) > MAX_STREAM_PRODUCTS:
+            return jsonify({"error": f"At most {MAX_STREAM_PRODUCTS} products per stream"}), 400
+
+        # Subscribe before reading the snapshot so no change falls between
+        subscriber = product_stream_hub.subscribe(product_ids)
+        if subscriber is None:
+            return jsonify({"error": "Too many open streams, retry later"}), 503
+        try:
+            snapshot = [
+                {"id": product.id, "stock": product.stock, "price": product.price, "active": product.active}
+                for product in db.session.execute(
+                    db.select(Product.id, effective_stock().label("stock"), Product.price, Product.active)
+                    .where(Product.id.in_(product_ids))
+                )
+            ]
+            # Hand the connection back to the pool; streams sit idle for minutes
+            db.session.close()
+        except Exception:
+            product_stream_hub.unsubscribe(subscriber)
+            raise
+
+        max_seconds = app.config['STREAM_MAX_SECONDS']
+
+        def events():
+            try:
+                yield f"retry: {STREAM_KEEPALIVE_SECONDS * 1000}\n\n"
+                yield _sse("snapshot", snapshot)
+                deadline = time.monotonic() + max_seconds
+                while time.monotonic() < deadline:
+                    changes = subscriber.wait(min(STREAM_KEEPALIVE_SECONDS, deadline - time.monotonic()))
+                    if changes:
+                        yield _sse("products", changes)
+                    else:
+                        yield ": keepalive\n\n"
+            finally:
+                product_stream_hub.unsubscribe(subscriber)
+
+        return Response(stream_with_context(events()), mimetype="text/event-stream", headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # don't let a proxy buffer the stream
+        })
+
+    except Exception as e:
+        print(f"Error opening product stream: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+def apply_stock_batch(items, sign, atomic):
+    """Apply a batch of {"id", "quantity"} items to stock in one statement
+    (sign -1 to take stock, +1 to put it back).
+
+    In atomic mode (the default) any failing line rolls back the whole
+    batch; otherwise the lines that pass are committed. Lines naming the
+    same product are summed.
+    """
+    failed_items = []
+    deltas = {}
+    for item in items:
+        product_id = item.get('id')
+        quantity = item.get('quantity', 1)
+
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            product_id = None
+        if not product_id or not isinstance(quantity, int) or quantity < 1:
+            failed_items.append({
+                "id": item.get('id'),
+                "reason": "invalid_item_data"
+            })
+            continue
+
+        deltas[product_id] = deltas.get(product_id, 0) + sign * quantity
+
+    if atomic and failed_items:
+        updated, failed = {}, []
+    else:
+        updated, failed = apply_stock_deltas(deltas)
+
+    if failed:
+        # Classify while the rows are still locked
+        levels = stock_levels(failed)
+        for product_id in failed:
+            if product_id not in levels:
                 failed_items.append({
                     "id": product_id,
                     "reason": "product_not_found"
                 })
-                continue
-            
-            if product.stock < ordered_quantity:
+            else:
                 failed_items.append({
                     "id": product_id,
                     "reason": "insufficient_stock",
-                    "available_stock": product.stock
+                    "available_stock": levels[product_id][0]
                 })
-                continue
-            
-            # Update product stock
-            product.stock -= ordered_quantity
-            success_count += 1
+
+    if atomic and failed_items:
+        db.session.rollback()
+        updated = {}
+    elif updated:
+        db.session.commit()
+        catalog_events.stock_changed(updated.values(), deltas)
+
+    return jsonify({
+        "success": len(failed_items) == 0,
+        "successful_updates": len(updated),
+        "failed_items": failed_items,
+        "atomic": atomic
+    }), 200
+
+
+# 🛠️ Update product stock after order placement
+@app.route("/api/product/update-stock", methods=["POST"])
+def update_product_stock():
+    try:
+        data = request.get_json()
         
-        # Commit changes if any successful updates
-        if success_count > 0:
-            db.session.commit()
+        if not data or not isinstance(data.get('items'), list):
+            return jsonify({"error": "Invalid request format"}), 400
         
-        return jsonify({
-            "success": len(failed_items) == 0,
-            "successful_updates": success_count,
-            "failed_items": failed_items
-        }), 200
+        return apply_stock_batch(data.get('items'), -1, data.get('atomic', True) is not False)
     
     except Exception as e:
         db.session.rollback()
@@ -142,46 +307,9 @@ def restore_product_stock():
         if not data or not isinstance(data.get('items'), list):
             return jsonify({"error": "Invalid request format"}), 400
         
-        order_items = data.get('items')
-        success_count = 0
-        failed_items = []
-        
-        for item in order_items:
-            product_id = item.get('id')
-            quantity = item.get('quantity', 1)
-            
-            if not product_id or quantity < 1:
-                failed_items.append({
-                    "id": product_id,
-                    "reason": "invalid_item_data"
-                })
-                continue
-            
-            # Get product from database
-            product = Product.query.get(product_id)
-            
-            if not product:
-                failed_items.append({
-                    "id": product_id,
-                    "reason": "product_not_found"
-                })
-                continue
-            
-            # Restore product stock
-            product.stock += quantity
-            success_count += 1
-        
-        # Commit changes if any successful updates
-        if success_count > 0:
-            db.session.commit()
-        
-        return jsonify({
-            "success": len(failed_items) == 0,
-            "successful_updates": success_count,
-            "failed_items": failed_items
-        }), 200
+        return apply_stock_batch(data.get('items'), 1, data.get('atomic', True) is not False)
     
     except Exception as e:
         db.session.rollback()
         print(f"Error restoring product stock: {str(e)}")
-        return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
+        return jsonify({"error": "Internal server error"}), 500
@@ -0,0 +1,109 @@
+# backend/routes/vendor_orders.py
+from app import app, db
+from models.order import Order
+from models.order_details import OrderDetails
+from models.order_archive import ArchivedOrder, ArchivedOrderDetails
+from models.product import Product
+from models.user import User
+from routes.vendor_products import vendor_id_for_user
+from services.orders import ORDER_STATUSES, parse_order_filters, apply_order_filters, order_history
+from services.pagination import parse_limit, encode_cursor, decode_cursor
+from flask import request, jsonify
+
+# Order fields a vendor sees (no payment or contact details)
+VENDOR_ORDER_FIELDS = (
+    "id", "username", "first_name", "last_name", "city", "state", "country", "status", "created_at"
+)
+
+# 📥 Orders containing the vendor's products, newest first
+@app.route("/api/vendor/orders", methods=["GET"])
+def get_vendor_orders():
+    try:
+        username = request.args.get('username')
+        if not username:
+            return jsonify({"error": "Username is required"}), 400
+
+        try:
+            filters = parse_order_filters(request.args)
+            limit = parse_limit(request.args.get('limit'))
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor, "vendor_orders") if cursor else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        vendor_id = vendor_id_for_user(username)
+        if vendor_id is None:
+            if not User.query.filter_by(username=username).first():
+                return jsonify({"error": "User not found"}), 404
+            return jsonify({"error": "Vendor profile not found"}), 404
+
+        # Orders with at least one of the vendor's products, live or
+        # archived, resolved in the database:
+        # products(vendor_id) -> order_details(product_id, order_id)
+        def vendor_orders(model, columns, filters):
+            details_model = model.details.property.mapper.class_
+            vendor_order_ids = db.select(details_model.order_id) \
+                .join(Product, Product.id == details_model.product_id) \
+                .where(Product.vendor_id == vendor_id)
+            select = db.select(*[getattr(model, column) for column in columns]) \
+                .where(model.id.in_(vendor_order_ids))
+            return apply_order_filters(select, filters, model)
+
+        orders = order_history(lambda model: vendor_orders(model, VENDOR_ORDER_FIELDS, filters), after, limit + 1)
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+
+        # Only the vendor's own line items, for the whole page in one query
+        items_by_order = {}
+        if orders:
+            order_ids = [order.id for order in orders]
+            items = db.union_all(*[
+                db.select(details_model.order_id, details_model.id, details_model.product_id,
+                          details_model.quantity, details_model.unit_price, Product.name, Product.image_url)
+                .join(Product, Product.id == details_model.product_id)
+                .where(details_model.order_id.in_(order_ids), Product.vendor_id == vendor_id)
+                for details_model in (OrderDetails, ArchivedOrderDetails)
+            ]).subquery()
+            rows = db.session.execute(db.select(items).order_by(items.c.order_id, items.c.id)).all()
+            for item in rows:
+                items_by_order.setdefault(item.order_id, []).append({
+                    "product_id": item.product_id,
+                    "product_name": item.name,
+                    "product_image": item.image_url,
+                    "quantity": item.quantity,
+                    "unit_price": item.unit_price,
+                    "subtotal": item.quantity * item.unit_price
+                })
+
+        order_list = []
+        for order in orders:
+            order_data = {field: getattr(order, field) for field in VENDOR_ORDER_FIELDS}
+            order_data["products"] = items_by_order.get(order.id, [])
+            order_data["vendor_subtotal"] = sum(item["subtotal"] for item in order_data["products"])
+            order_list.append(order_data)
+
+        # Per-status counts over the same orders (status filter not applied)
+        count_filters = {key: value for key, value in filters.items() if key != "status"}
+        status_counts = dict.fromkeys(ORDER_STATUSES, 0)
+        statuses = db.union_all(*[
+            vendor_orders(model, ("status",), count_filters) for model in (Order, ArchivedOrder)
+        ]).subquery()
+        counts = db.session.execute(
+            db.select(statuses.c.status, db.func.count()).group_by(statuses.c.status)
+        )
+        for status, count in counts:
+            status_counts[status] = count
+
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor("vendor_orders", [orders[-1].created_at, orders[-1].id])
+
+        return jsonify({
+            "orders": order_list,
+            "next_cursor": next_cursor,
+            "status_counts": status_counts
+        }), 200
+
+    except Exception as e:
+        print(f"Error fetching vendor orders: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
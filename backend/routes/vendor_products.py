@@ -7,9 +7,30 @@ import uuid
 from models.product import Product
 from models.user import User
 from models.vendor import Vendor
+from services import catalog_events, stock_shards
+from services.cache import catalog_cache
+from services.catalog import PRODUCT_FIELDS, product_to_dict, product_load_options
+from services.fields import parse_fields
+from services.compression import cache_compressed
+
+# Storefront rows omit vendor_id (it is the same for every row)
+VENDOR_PRODUCT_FIELDS = tuple(field for field in PRODUCT_FIELDS if field != "vendor_id")
+
+def vendor_id_for_user(username):
+    """Resolve a username to its vendor id, or None (cached once found;
+    vendor records are long-lived)."""
+    def load_vendor_id():
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            return None
+        vendor = Vendor.query.filter_by(email=user.email).first()
+        return vendor.id if vendor else None
+
+    return catalog_cache.get_or_load(("vendor_for_user", username), [], load_vendor_id, cache_none=False)
 
 # 🔍 Get vendor products
 @app.route("/api/vendor/products", methods=["GET"])
+@cache_compressed
 def get_vendor_products():
     try:
         # Get vendor username from query parameter
@@ -18,42 +39,29 @@ def get_vendor_products():
         
         if not username:
             return jsonify({"error": "Username is required"}), 400
-        
-        # Find the user
-        user = User.query.filter_by(username=username).first()
-        if not user:
-            print(f"User not found: {username}")
-            return jsonify({"error": "User not found"}), 404
-        
-        print(f"Found user with role: {user.role}")
-        
-        # Find vendor by email or username
-        vendor = Vendor.query.filter_by(email=user.email).first()
-        if not vendor:
+
+        try:
+            fields = parse_fields(request.args.get('fields'), VENDOR_PRODUCT_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        vendor_id = vendor_id_for_user(username)
+        if vendor_id is None:
+            if not User.query.filter_by(username=username).first():
+                print(f"User not found: {username}")
+                return jsonify({"error": "User not found"}), 404
             print(f"Vendor profile not found for user: {username}")
             # Return empty products list instead of error
             return jsonify([]), 200
         
-        print(f"Found vendor with ID: {vendor.id}")
-        
         # Get all products for this vendor
-        products = Product.query.filter_by(vendor_id=vendor.id).all()
-        print(f"Found {len(products)} products for vendor")
-        
-        # Convert to JSON response
-        product_list = []
-        for product in products:
-            product_list.append({
-                "id": product.id,
-                "name": product.name,
-                "price": product.price,
-                "description": product.description,
-                "category": product.category,
-                "image_url": product.image_url,
-                "rating": product.rating,
-                "stock": product.stock,
-                "active": product.active
-            })
+        def load_vendor_products():
+            query = Product.query.filter_by(vendor_id=vendor_id).options(*product_load_options(fields))
+            return [product_to_dict(product, fields or VENDOR_PRODUCT_FIELDS) for product in query.all()]
+
+        product_list = catalog_cache.get_or_load(
+            ("vendor_products", vendor_id, fields), [("vendor", vendor_id)], load_vendor_products
+        )
         
         return jsonify(product_list), 200
         
@@ -110,13 +118,15 @@ def add_vendor_product():
         )
         
         db.session.add(new_product)
+        saved = catalog_events.snapshot([new_product])
         db.session.commit()
+        catalog_events.products_saved(saved)
         
-        print(f"Product added successfully: {new_product.id}")
+        print(f"Product added successfully: {saved[0]['id']}")
         
         return jsonify({
             "message": "Product added successfully",
-            "product_id": new_product.id
+            "product_id": saved[0]["id"]
         }), 201
     
     except Exception as e:
@@ -187,19 +197,26 @@ def update_vendor_product(product_id):
             
         if 'stock' in data and data['stock'] is not None:
             try:
-                product.stock = int(data['stock'])
+                stock = int(data['stock'])
             except (ValueError, TypeError):
                 return jsonify({"error": "Invalid stock format"}), 400
+            if product.stock_shards:
+                # Hot product: the new total is spread over its stock shards
+                stock_shards.set_total(product, stock)
+            else:
+                product.stock = stock
                 
         if 'active' in data:
             product.active = bool(data['active'])
         
         # Save changes to database
+        saved = catalog_events.snapshot([product])
         db.session.commit()
+        catalog_events.products_saved(saved)
         
         return jsonify({
             "message": "Product updated successfully",
-            "product_id": product.id
+            "product_id": product_id
         }), 200
     
     except Exception as e:
@@ -245,9 +262,12 @@ def delete_vendor_product(product_id):
         if product.vendor_id != vendor.id:
             return jsonify({"error": "You don't have permission to delete this product"}), 403
         
-        # Delete the product
+        # Delete the product (dropping its stock shards if it is hot)
+        if product.stock_shards:
+            stock_shards.disable_hot_mode(product.id)
         db.session.delete(product)
         db.session.commit()
+        catalog_events.products_deleted([product])
         
         return jsonify({
             "message": "Product deleted successfully"
@@ -297,6 +317,7 @@ def bulk_add_vendor_products():
             print(f"Created new vendor record for {username}")
         
         # Create products
+        new_products = []
         product_ids = []
         for product_data in data['products']:
             # Validate required fields
@@ -319,9 +340,12 @@ def bulk_add_vendor_products():
             
             db.session.add(new_product)
             db.session.flush()  # Get ID without committing
+            new_products.append(new_product)
             product_ids.append(new_product.id)
         
+        saved = catalog_events.snapshot(new_products)
         db.session.commit()
+        catalog_events.products_saved(saved)
         
         return jsonify({
             "message": f"Successfully added {len(product_ids)} products",
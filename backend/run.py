@@ -1,4 +1,10 @@
-from app import app
+import os
+
+from app import app, check_schema, start_background_workers
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    check_schema()
+    # The debug reloader serves from a child process; start workers there
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_workers()
+    app.run(debug=True)
@@ -0,0 +1,157 @@
+# backend/services/cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from app import app
+
+
+class _Flight:
+    """A load in progress that concurrent misses on the same key wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class VersionedCache:
+    """Bounded LRU + TTL cache with per-entity versions and single-flight loads.
+
+    Every entry is stored under its key plus the current versions of the
+    scopes it depends on (e.g. ("product", 12) or ("catalog",)). Bumping a
+    scope makes those keys unreachable, so invalidation is O(1) and a load
+    that races with a write can never publish a stale value under the new
+    version. Unreachable entries age out through LRU/TTL.
+    """
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # full key -> (expires_at, value)
+        self._versions = {}            # scope -> int
+        self._generation = 0           # bumped by clear() to drop everything
+        self._flights = {}             # full key -> _Flight
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def bump(self, *scopes):
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+            self.invalidations += len(scopes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def get_or_load(self, key, scopes, loader, cache_none=True):
+        """Return the cached value for key, calling loader() once on a miss.
+
+        Concurrent misses for the same key wait for the first caller's load
+        instead of each querying the database.
+        """
+        with self._lock:
+            versions = tuple(self._versions.get(scope, 0) for scope in scopes)
+            full_key = (key, self._generation, versions)
+            entry = self._entries.get(full_key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(full_key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[full_key]
+
+            flight = self._flights.get(full_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[full_key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[full_key]
+                if flight.error is None and (cache_none or flight.value is not None):
+                    self._entries[full_key] = (time.monotonic() + self.ttl_seconds, flight.value)
+                    self._entries.move_to_end(full_key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+            flight.done.set()
+        return flight.value
+
+    def get_many(self, scopes_by_key, loader):
+        """Batch variant of get_or_load: returns {key: value} for every key in
+        scopes_by_key ({key: scopes}), calling loader(missing_keys) once with
+        all misses. Loaded values are stored under the versions read before
+        the load, like get_or_load. Misses are not coalesced across batches.
+        """
+        values = {}
+        missing = {}
+        with self._lock:
+            now = time.monotonic()
+            for key, scopes in scopes_by_key.items():
+                versions = tuple(self._versions.get(scope, 0) for scope in scopes)
+                full_key = (key, self._generation, versions)
+                entry = self._entries.get(full_key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(full_key)
+                    self.hits += 1
+                    values[key] = entry[1]
+                else:
+                    missing[key] = full_key
+                    self.misses += 1
+
+        if missing:
+            loaded = loader(list(missing))
+            with self._lock:
+                expires_at = time.monotonic() + self.ttl_seconds
+                for key, full_key in missing.items():
+                    values[key] = loaded.get(key)
+                    self._entries[full_key] = (expires_at, values[key])
+                    self._entries.move_to_end(full_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return values
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+# Product reads: details, catalog listings and vendor storefronts
+catalog_cache = VersionedCache(
+    max_entries=app.config['CATALOG_CACHE_MAX_ENTRIES'],
+    ttl_seconds=app.config['CATALOG_CACHE_TTL'],
+)
+
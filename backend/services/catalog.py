@@ -0,0 +1,208 @@
+# backend/services/catalog.py
+from sqlalchemy.orm import load_only
+
+from app import db
+from models.product import Product
+
+# Sort name -> (sort column, descending?). Every sort is tie-broken on id in
+# the same direction so (column, id) is a unique keyset for cursors.
+PRODUCT_SORTS = {
+    "newest": (Product.created_at, True),
+    "oldest": (Product.created_at, False),
+    "price_asc": (Product.price, False),
+    "price_desc": (Product.price, True),
+}
+DEFAULT_PRODUCT_SORT = "newest"
+
+
+PRODUCT_FIELDS = (
+    "id", "name", "price", "rating", "image_url", "vendor_id",
+    "stock", "description", "category", "active"
+)
+# Always loaded because sorting, cursors and ETags depend on them
+PRODUCT_KEY_COLUMNS = (Product.id, Product.price, Product.created_at, Product.updated_at)
+
+
+def product_to_dict(product, fields=None):
+    if fields is not None:
+        return {field: getattr(product, field) for field in fields}
+    return {
+        "id": product.id,
+        "name": product.name,
+        "price": product.price,
+        "rating": product.rating,
+        "image_url": product.image_url,
+        "vendor_id": product.vendor_id,
+        "stock": product.stock,
+        "description": product.description,
+        "category": product.category,
+        "active": product.active
+    }
+
+
+def product_load_options(fields):
+    """Query options that only fetch the columns a sparse fieldset needs."""
+    if fields is None:
+        return []
+    columns = {getattr(Product, field) for field in fields}.union(PRODUCT_KEY_COLUMNS)
+    return [load_only(*columns)]
+
+
+def _parse_bool(value):
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def parse_product_filters(args, allow_inactive=False):
+    """Read the catalog filters from request args.
+
+    Inactive products are only reachable when the caller opts in with
+    allow_inactive (internal/export endpoints). Raises ValueError with a
+    user-facing message on malformed input.
+    """
+    filters = {}
+
+    category = args.get("category")
+    if category:
+        filters["category"] = category
+
+    for key in ("vendor_id", "exclude"):
+        value = args.get(key)
+        if value:
+            try:
+                filters[key] = int(value)
+            except ValueError:
+                raise ValueError(f"{key} must be an integer")
+
+    for key in ("min_price", "max_price"):
+        value = args.get(key)
+        if value:
+            try:
+                filters[key] = float(value)
+            except ValueError:
+                raise ValueError(f"{key} must be a number")
+
+    if _parse_bool(args.get("in_stock", "false")):
+        filters["in_stock"] = True
+
+    if allow_inactive and _parse_bool(args.get("include_inactive", "false")):
+        filters["include_inactive"] = True
+
+    return filters
+
+
+def apply_product_filters(query, filters):
+    """Apply filters from parse_product_filters to a Product query or select()."""
+    if not filters.get("include_inactive"):
+        query = query.filter(Product.active.is_(True))
+    if "category" in filters:
+        query = query.filter(Product.category == filters["category"])
+    if "vendor_id" in filters:
+        query = query.filter(Product.vendor_id == filters["vendor_id"])
+    if "exclude" in filters:
+        query = query.filter(Product.id != filters["exclude"])
+    if "min_price" in filters:
+        query = query.filter(Product.price >= filters["min_price"])
+    if "max_price" in filters:
+        query = query.filter(Product.price <= filters["max_price"])
+    if filters.get("in_stock"):
+        query = query.filter(Product.stock > 0)
+    return query
+
+
+def apply_product_sort(query, sort, after=None):
+    """Order a Product query by `sort` and, given the last (value, id) of the
+    previous page, seek past it instead of using OFFSET."""
+    column, descending = PRODUCT_SORTS[sort]
+    if after is not None:
+        keyset = db.tuple_(column, Product.id)
+        query = query.filter(keyset < tuple(after) if descending else keyset > tuple(after))
+    if descending:
+        return query.order_by(column.desc(), Product.id.desc())
+    return query.order_by(column.asc(), Product.id.asc())
+
+
+def product_sort_key(product, sort):
+    column, _ = PRODUCT_SORTS[sort]
+    return [getattr(product, column.key), product.id]
+
+
+# Columns written by the catalog export, in output order
+EXPORT_COLUMNS = [
+    Product.id, Product.vendor_id, Product.name, Product.price, Product.description,
+    Product.category, Product.rating, Product.image_url, Product.stock, Product.active,
+    Product.created_at, Product.updated_at,
+]
+EXPORT_BATCH_SIZE = 1000
+
+
+def iter_export_batches(filters, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the filtered catalog as lists of plain column tuples.
+
+    Selects columns only (no ORM identity map) and uses yield_per, which
+    makes psycopg2 use a server-side cursor, so memory is bounded by one
+    batch regardless of table size.
+    """
+    stmt = apply_product_filters(db.select(*EXPORT_COLUMNS), filters).order_by(Product.id)
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        for batch in result.partitions():
+            yield batch
+    finally:
+        result.close()
+
+
+def compute_facets(filters, bucket_width):
+    """Category counts, vendor counts and a price histogram for the filtered
+    catalog in one aggregate pass (GROUPING SETS), without loading rows."""
+    filtered = apply_product_filters(
+        db.select(
+            Product.category.label("category"),
+            Product.vendor_id.label("vendor_id"),
+            Product.price.label("price"),
+            db.func.floor(Product.price / bucket_width).label("bucket"),
+        ),
+        filters
+    ).subquery()
+
+    stmt = db.select(
+        filtered.c.category,
+        filtered.c.vendor_id,
+        filtered.c.bucket,
+        db.func.grouping(filtered.c.category).label("no_category"),
+        db.func.grouping(filtered.c.vendor_id).label("no_vendor"),
+        db.func.grouping(filtered.c.bucket).label("no_bucket"),
+        db.func.count().label("product_count"),
+        db.func.min(filtered.c.price).label("min_price"),
+        db.func.max(filtered.c.price).label("max_price"),
+    ).group_by(
+        db.func.grouping_sets(
+            db.tuple_(filtered.c.category),
+            db.tuple_(filtered.c.vendor_id),
+            db.tuple_(filtered.c.bucket),
+            db.tuple_(),
+        )
+    )
+
+    facets = {"total": 0, "min_price": None, "max_price": None,
+              "categories": [], "vendors": [], "price_histogram": []}
+    for row in db.session.execute(stmt):
+        if not row.no_category:
+            facets["categories"].append({"category": row.category, "count": row.product_count})
+        elif not row.no_vendor:
+            facets["vendors"].append({"vendor_id": row.vendor_id, "count": row.product_count})
+        elif not row.no_bucket:
+            bucket = int(row.bucket)
+            facets["price_histogram"].append({
+                "min": bucket * bucket_width,
+                "max": (bucket + 1) * bucket_width,
+                "count": row.product_count
+            })
+        else:
+            facets["total"] = row.product_count
+            facets["min_price"] = row.min_price
+            facets["max_price"] = row.max_price
+
+    facets["categories"].sort(key=lambda facet: (-facet["count"], facet["category"] or ""))
+    facets["vendors"].sort(key=lambda facet: (-facet["count"], facet["vendor_id"] or 0))
+    facets["price_histogram"].sort(key=lambda facet: facet["min"])
+    return facets
@@ -0,0 +1,100 @@
+# backend/services/catalog_events.py
+# Routes call these after a successful commit so in-process catalog state
+# (search and suggest indexes, read cache) follows product writes without
+# re-reading the table, and open product streams (SSE) see the change.
+# products_saved() takes snapshot() dicts taken before the commit; the other
+# hooks take Product instances or rows with the same attributes.
+import threading
+
+from app import db
+from services.cache import catalog_cache
+from services.search_index import product_search_index
+from services.stream_hub import product_stream_hub
+from services.suggest_index import product_suggest_index
+
+
+# Product fields the hooks read (the search index's columns)
+SNAPSHOT_FIELDS = ("id", "name", "description", "category", "vendor_id", "price", "stock", "active", "updated_at")
+
+
+def snapshot(products):
+    """Flush and copy the fields products_saved() needs into plain dicts.
+    Call before commit: committing expires the instances, and reading them
+    afterwards costs one SELECT per product."""
+    db.session.flush()
+    return [{field: getattr(product, field) for field in SNAPSHOT_FIELDS} for product in products]
+
+
+def _invalidate(keys, catalog=True):
+    """keys: (product_id, vendor_id) pairs; catalog=False keeps the
+    catalog-wide listings and facets."""
+    scopes = {("catalog",)} if catalog else set()
+    for product_id, vendor_id in keys:
+        scopes.add(("product", product_id))
+        scopes.add(("vendor", vendor_id))
+    catalog_cache.bump(*scopes)
+
+
+def products_saved(snapshots):
+    """Products were created or updated (any field); takes snapshot() dicts."""
+    for fields in snapshots:
+        product_search_index.upsert(fields)
+        product_suggest_index.upsert(fields)
+    _invalidate((fields["id"], fields["vendor_id"]) for fields in snapshots)
+    product_stream_hub.publish([
+        {"id": fields["id"], "stock": fields["stock"], "price": fields["price"], "active": fields["active"]}
+        for fields in snapshots
+    ])
+
+
+def products_deleted(products):
+    for product in products:
+        product_search_index.remove(product.id)
+        product_suggest_index.remove(product.id)
+    _invalidate((product.id, product.vendor_id) for product in products)
+    product_stream_hub.publish([{"id": product.id, "active": False, "deleted": True} for product in products])
+
+
+def stock_changed(products, moved=None):
+    """Only stock moved (orders, stock routes); needs id, vendor_id and stock.
+
+    moved is {product_id: units added (negative when taken)}. Catalog
+    listings and facets are only invalidated when a product went in or out
+    of stock (or its move is unknown), so the stock figures they show may
+    lag by CATALOG_CACHE_TTL; product details and vendor listings never do."""
+    products = list(products)
+    for product in products:
+        product_search_index.update_stock(product.id, product.stock)
+    flipped = any(
+        moved is None or product.id not in moved or (product.stock > 0) != (product.stock - moved[product.id] > 0)
+        for product in products
+    )
+    _invalidate(((product.id, product.vendor_id) for product in products), catalog=flipped)
+    product_stream_hub.publish([{"id": product.id, "stock": product.stock} for product in products])
+
+
+def sales_recorded(units_by_product):
+    """Units were sold ({product_id: quantity}) or returned (negative)."""
+    if units_by_product:
+        product_suggest_index.record_sales(units_by_product)
+
+
+def catalog_cleared():
+    product_search_index.clear()
+    product_suggest_index.clear()
+    catalog_cache.clear()
+
+
+def start_index_warmup(app):
+    """Build the in-memory search and suggest indexes in a background
+    thread so worker startup is not blocked on reading the catalog."""
+    def build():
+        with app.app_context():
+            for name, index in (("search", product_search_index), ("suggest", product_suggest_index)):
+                try:
+                    index.ensure_built()
+                    print(f"Product {name} index built")
+                except Exception as e:
+                    print(f"Error building product {name} index: {str(e)}")
+
+    threading.Thread(target=build, name="catalog-index-warmup", daemon=True).start()
@@ -0,0 +1,172 @@
+# backend/services/compression.py
+import functools
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, request
+
+from app import app
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "text/csv"}
+
+
+def cache_compressed(view):
+    """Mark a view's responses as worth keeping compressed: identical bodies
+    (hot catalog pages, facets, storefronts) are then compressed once."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.cache_compressed = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (body digest, encoding), bounded
+    by total compressed bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes}
+
+
+class ResponseCompressor:
+    def __init__(self, app):
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESS_LEVEL']
+        self.brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+        self.cache = CompressedBodyCache(app.config['COMPRESS_CACHE_MAX_BYTES'])
+        self._lock = threading.Lock()
+        self.counters = {
+            "compressed": 0,
+            "cache_hits": 0,
+            "skipped_small": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "cpu_seconds": 0.0,
+        }
+        app.after_request(self.compress_response)
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+
+    def _choose_encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return None
+
+    def _compress(self, data, encoding):
+        started = time.thread_time()
+        if encoding == "br":
+            compressed = brotli.compress(data, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+        self._count(compressed=1, cpu_seconds=time.thread_time() - started)
+        return compressed
+
+    def compress_response(self, response):
+        if response.status_code == 304:
+            return self._echo_encoded_etag(response)
+        if (response.status_code < 200 or response.status_code >= 300
+                or response.status_code == 204
+                or response.is_streamed
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = self._choose_encoding()
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            self._count(skipped_small=1)
+            return response
+
+        compressed = None
+        cache_key = None
+        if g.get("cache_compressed"):
+            cache_key = (hashlib.sha1(data).digest(), encoding)
+            compressed = self.cache.get(cache_key)
+            if compressed is not None:
+                self._count(cache_hits=1)
+
+        if compressed is None:
+            compressed = self._compress(data, encoding)
+            if cache_key is not None:
+                self.cache.put(cache_key, compressed)
+
+        self._count(bytes_in=len(data), bytes_out=len(compressed))
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+
+        # A different encoding is a different representation, so give it a
+        # distinct strong ETag (services.http_cache accepts it back)
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f"{etag}-{encoding}")
+        return response
+
+    def _echo_encoded_etag(self, response):
+        # A 304 should repeat the validator the client sent, which carries
+        # the encoding suffix if the cached copy was compressed
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            for encoding in ("gzip", "br"):
+                if request.if_none_match.contains(f"{etag}-{encoding}"):
+                    response.set_etag(f"{etag}-{encoding}")
+                    response.vary.add("Accept-Encoding")
+                    break
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["cpu_seconds"] = round(stats["cpu_seconds"], 6)
+        stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 4) if stats["bytes_in"] else None
+        stats["gzip_level"] = self.gzip_level
+        stats["brotli_available"] = brotli is not None
+        stats["cache"] = self.cache.stats()
+        return stats
+
+
+# Registers itself as an after_request hook
+response_compressor = ResponseCompressor(app)
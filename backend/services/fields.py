@@ -0,0 +1,25 @@
+# backend/services/fields.py
+
+
+def parse_fields(raw_fields, allowed, always=("id",)):
+    """Parse a ?fields=a,b,c sparse fieldset.
+
+    Returns None when no fieldset was requested (full representation),
+    otherwise a tuple in the order of `allowed` that always includes the
+    `always` fields. Raises ValueError naming any unknown field.
+    """
+    if not raw_fields:
+        return None
+    requested = {field.strip() for field in raw_fields.split(",") if field.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.update(always)
+    return tuple(field for field in allowed if field in requested)
+
+
+def project(data, fields):
+    """Keep only `fields` of a serialized dict (no-op for None)."""
+    if fields is None:
+        return data
+    return {field: data[field] for field in fields if field in data}
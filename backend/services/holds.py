@@ -0,0 +1,199 @@
+# backend/services/holds.py
+# Time-boxed cart holds: quantity set aside for a cart between verify-stock
+# and checkout. Available stock is stock minus unexpired holds; checkouts
+# (services.stock.reserve_stock) respect other carts' holds and consume
+# their own. The stock_holds table is the source of truth, hold_index is a
+# per-worker copy for cheap availability reads.
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from app import app, db
+from models.product import Product
+from models.stock_hold import StockHold
+from services import stock_shards
+
+# Expired rows are deleted by the sweeper in batches of this size
+SWEEP_BATCH_SIZE = 1000
+SWEEP_INTERVAL_SECONDS = 30
+# Other workers' holds show up in hold_index within this bound
+INDEX_REFRESH_SECONDS = 5
+
+
+class HoldIndex:
+    """Unexpired holds by product: {product_id: {hold_token: (quantity,
+    expires_at)}}. Updated in place by this worker's hold changes and
+    reloaded from the table every INDEX_REFRESH_SECONDS."""
+
+    def __init__(self):
+        self._by_product = {}
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+
+    def ensure_fresh(self):
+        if time.monotonic() - self._last_refresh < INDEX_REFRESH_SECONDS:
+            return
+        self._last_refresh = time.monotonic()
+        rows = db.session.execute(
+            db.select(StockHold.product_id, StockHold.hold_token, StockHold.quantity, StockHold.expires_at)
+            .where(StockHold.expires_at > datetime.utcnow())
+        ).all()
+        by_product = {}
+        for product_id, hold_token, quantity, expires_at in rows:
+            by_product.setdefault(product_id, {})[hold_token] = (quantity, expires_at)
+        with self._lock:
+            self._by_product = by_product
+
+    def held(self, product_ids, exclude_token=None):
+        """{product_id: units held by carts other than exclude_token}."""
+        now = datetime.utcnow()
+        with self._lock:
+            return {
+                product_id: sum(
+                    quantity for token, (quantity, expires_at) in self._by_product.get(product_id, {}).items()
+                    if token != exclude_token and expires_at > now
+                )
+                for product_id in product_ids
+            }
+
+    def replace_token(self, hold_token, holds):
+        """holds: {product_id: (quantity, expires_at)}; {} to drop the cart."""
+        with self._lock:
+            for product_id in list(self._by_product):
+                self._by_product[product_id].pop(hold_token, None)
+            for product_id, hold in holds.items():
+                self._by_product.setdefault(product_id, {})[hold_token] = hold
+
+    def prune(self):
+        now = datetime.utcnow()
+        with self._lock:
+            for product_id in list(self._by_product):
+                holds = {token: hold for token, hold in self._by_product[product_id].items() if hold[1] > now}
+                if holds:
+                    self._by_product[product_id] = holds
+                else:
+                    del self._by_product[product_id]
+
+    def stats(self):
+        now = datetime.utcnow()
+        with self._lock:
+            active = [hold for holds in self._by_product.values() for hold in holds.values() if hold[1] > now]
+        return {"active_holds": len(active), "held_units": sum(quantity for quantity, _ in active)}
+
+
+hold_index = HoldIndex()
+
+
+def place_holds(quantities, hold_token=None, username=None):
+    """Hold {product_id: quantity} for one cart inside the caller's
+    transaction, replacing that cart's previous holds. All or nothing: on
+    failure nothing is inserted and the caller must roll back.
+
+    Product rows are locked in id order (like checkouts), so two carts
+    cannot both take the last units. Hot products are checked against the
+    sum of their stock shards. Returns (hold_token, expires_at,
+    failures) where failures is a list of {"id", "reason", ...}.
+    """
+    hold_token = hold_token or uuid.uuid4().hex
+    product_ids = sorted(quantities)
+    now = datetime.utcnow()
+
+    levels = {
+        product_id: (stock, active)
+        for product_id, stock, active in db.session.execute(
+            db.select(Product.id, stock_shards.effective_stock(), Product.active)
+            .where(Product.id.in_(product_ids)).order_by(Product.id).with_for_update(of=Product)
+        )
+    }
+    db.session.execute(
+        db.delete(StockHold).where(StockHold.hold_token == hold_token)
+        .execution_options(synchronize_session=False)
+    )
+    held = dict(db.session.execute(
+        db.select(StockHold.product_id, db.func.sum(StockHold.quantity))
+        .where(StockHold.product_id.in_(product_ids), StockHold.expires_at > now)
+        .group_by(StockHold.product_id)
+    ).all())
+
+    failures = []
+    for product_id in product_ids:
+        if product_id not in levels:
+            failures.append({"id": product_id, "reason": "product_not_found"})
+            continue
+        stock, active = levels[product_id]
+        available = stock - (held.get(product_id) or 0)
+        if not active:
+            failures.append({"id": product_id, "reason": "product_inactive"})
+        elif available < quantities[product_id]:
+            failures.append({"id": product_id, "reason": "insufficient_stock", "available_stock": max(available, 0)})
+    if failures:
+        return hold_token, None, failures
+
+    expires_at = now + timedelta(minutes=app.config['STOCK_HOLD_MINUTES'])
+    db.session.execute(db.insert(StockHold), [
+        {"hold_token": hold_token, "username": username, "product_id": product_id,
+         "quantity": quantities[product_id], "expires_at": expires_at, "created_at": now}
+        for product_id in product_ids
+    ])
+    return hold_token, expires_at, []
+
+
+def release_holds(hold_token):
+    """Delete a cart's holds inside the caller's transaction."""
+    db.session.execute(
+        db.delete(StockHold).where(StockHold.hold_token == hold_token)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def held_by_others(product_id, hold_token=None):
+    """Scalar subquery (correlated when product_id is a column): units of
+    product_id held by unexpired carts other than hold_token."""
+    conditions = [StockHold.product_id == product_id, StockHold.expires_at > datetime.utcnow()]
+    if hold_token:
+        conditions.append(StockHold.hold_token != hold_token)
+    return db.select(db.func.coalesce(db.func.sum(StockHold.quantity), 0)) \
+        .where(*conditions).scalar_subquery()
+
+
+class HoldSweeper:
+    """Deletes expired holds in bounded batches. Expired holds already stop
+    counting at expires_at; sweeping only keeps the table small."""
+
+    def __init__(self):
+        self._thread = None
+        self.swept = 0
+
+    def start(self, app):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(app,), name="stock-hold-sweeper", daemon=True)
+            self._thread.start()
+
+    def _run(self, app):
+        while True:
+            time.sleep(SWEEP_INTERVAL_SECONDS)
+            with app.app_context():
+                try:
+                    while self.sweep_batch() == SWEEP_BATCH_SIZE:
+                        pass
+                    hold_index.prune()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error sweeping expired stock holds: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    def sweep_batch(self):
+        expired = db.select(StockHold.id).where(StockHold.expires_at <= datetime.utcnow()) \
+            .order_by(StockHold.id).limit(SWEEP_BATCH_SIZE)
+        deleted = db.session.execute(
+            db.delete(StockHold).where(StockHold.id.in_(expired.scalar_subquery()))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        self.swept += deleted
+        return deleted
+
+
+hold_sweeper = HoldSweeper()
@@ -0,0 +1,51 @@
+# backend/services/http_cache.py
+import hashlib
+from datetime import timezone
+
+from flask import request, jsonify, make_response
+
+
+def make_etag(*parts):
+    """Strong validator from values that change whenever the body does
+    (ids and updated_at timestamps), so every worker derives the same tag."""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+    return digest[:32]
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    # Timestamps are stored without a zone and written as UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def is_not_modified(etag, last_modified=None):
+    """Evaluate If-None-Match / If-Modified-Since against the validators.
+
+    If-Modified-Since is only consulted when no If-None-Match was sent.
+    """
+    if request.if_none_match:
+        # Compressed responses carry "<etag>-gzip"/"<etag>-br" (see
+        # services.compression); they validate the same underlying data
+        return any(
+            request.if_none_match.contains(candidate)
+            for candidate in (etag, f"{etag}-gzip", f"{etag}-br")
+        )
+    if request.if_modified_since and last_modified is not None:
+        return _as_utc(last_modified).replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional_json(payload, etag, last_modified=None):
+    """Return 304 if the client's copy is current, else the JSON body,
+    both carrying ETag/Last-Modified. The body is only serialized for 200s."""
+    if is_not_modified(etag, last_modified):
+        response = make_response("", 304)
+    else:
+        response = jsonify(payload)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    # Let browsers keep the copy but revalidate it on every use
+    response.headers["Cache-Control"] = "no-cache"
+    return response
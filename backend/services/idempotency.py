@@ -0,0 +1,311 @@
+# backend/services/idempotency.py
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import Response, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+from models.idempotency_key import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# How long a duplicate waits for the first request before giving up with 409
+WAIT_TIMEOUT_SECONDS = 30
+# A pending row older than this belongs to a worker that died mid-request.
+# Only "pending" rows (nothing committed yet) are ever taken over.
+PENDING_TIMEOUT_SECONDS = 120
+PURGE_INTERVAL_SECONDS = 3600
+FRONT_CACHE_MAX_ENTRIES = 10000
+
+
+class _StoredResponse:
+    def __init__(self, request_hash, status, body):
+        self.request_hash = request_hash
+        self.status = status
+        self.body = body
+
+    def to_response(self):
+        response = Response(self.body, status=self.status, mimetype="application/json")
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+
+class IdempotencyStore:
+    """Runs a handler at most once per (scope, Idempotency-Key).
+
+    The idempotency_keys table is the source of truth across workers: the
+    first request inserts a pending row (unique on scope + key), runs the
+    handler and stores its response; duplicates find the row and replay
+    the response. Within a worker, duplicates wait on the first request's
+    event instead of polling, and completed responses are kept in a small
+    TTL cache so replays don't touch the database.
+
+    Routes call record_response() just before their commit, so the order
+    (or payment) and its replayable response commit together. Any other
+    commit made by the handler flips the row to "committed" in the same
+    transaction; such a key is never taken over and run again.
+    """
+
+    def __init__(self, cache_ttl_seconds, retention_hours):
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.retention = timedelta(hours=retention_hours)
+        self._responses = OrderedDict()  # (scope, key) -> (expires_at, _StoredResponse)
+        self._flights = {}               # (scope, key) -> threading.Event
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.replays = 0
+        self.executions = 0
+
+    # ---- front cache ----
+
+    def _cached(self, full_key):
+        entry = self._responses.get(full_key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._responses[full_key]
+            return None
+        return entry[1]
+
+    def _remember(self, full_key, stored):
+        with self._lock:
+            self._responses[full_key] = (time.monotonic() + self.cache_ttl_seconds, stored)
+            self._responses.move_to_end(full_key)
+            while len(self._responses) > FRONT_CACHE_MAX_ENTRIES:
+                self._responses.popitem(last=False)
+
+    # ---- execution ----
+
+    def run(self, scope, key, request_hash, handler):
+        full_key = (scope, key)
+        deadline = time.monotonic() + WAIT_TIMEOUT_SECONDS
+        while True:
+            with self._lock:
+                stored = self._cached(full_key)
+                if stored is None:
+                    event = self._flights.get(full_key)
+                    leader = event is None
+                    if leader:
+                        event = self._flights[full_key] = threading.Event()
+            if stored is not None:
+                return self._replay(stored, request_hash)
+            if leader:
+                break
+            # Another thread of this worker is running the same key
+            if not event.wait(max(0.0, deadline - time.monotonic())):
+                return _in_progress()
+
+        try:
+            return self._run_once(scope, key, request_hash, handler, deadline)
+        finally:
+            with self._lock:
+                del self._flights[full_key]
+            event.set()
+
+    def _run_once(self, scope, key, request_hash, handler, deadline):
+        self._purge_expired()
+        while True:
+            row = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+            if row is None:
+                claim = self._claim(scope, key, request_hash)
+                if claim is not None:
+                    break
+                continue
+            if row.status == "completed":
+                stored = _StoredResponse(row.request_hash, row.response_status, row.response_body)
+                db.session.rollback()  # end the read transaction
+                self._remember((scope, key), stored)
+                return self._replay(stored, request_hash)
+            if self._take_over_abandoned(row):
+                claim = row.id
+                break
+            # Running in another worker (or its side effects are committed
+            # but its response was never stored): wait for it
+            status = row.status
+            db.session.rollback()
+            if time.monotonic() >= deadline:
+                return _already_processed() if status == "committed" else _in_progress()
+            time.sleep(0.1)
+
+        g.idempotency_claim = claim
+        try:
+            response = app.make_response(handler())
+        except Exception:
+            self._settle(claim, None)
+            raise
+        finally:
+            g.pop("idempotency_claim", None)
+
+        stored = self._settle(claim, response)
+        if stored is not None:
+            self._remember((scope, key), stored)
+            with self._lock:
+                self.executions += 1
+        return response
+
+    def _settle(self, claim, response):
+        """Finish a claimed key after its handler ran. Returns the stored
+        response, or None when the key was released or left unresolved."""
+        db.session.rollback()
+        row = db.session.get(IdempotencyKey, claim)
+        if row is None:
+            return None
+        if row.status == "completed":
+            # Recorded by the route in its own transaction
+            stored = _StoredResponse(row.request_hash, row.response_status, row.response_body)
+            db.session.rollback()
+            return stored
+        if row.status == "pending" and (response is None or response.status_code >= 500):
+            # Nothing was committed: let the client retry the key
+            db.session.delete(row)
+            db.session.commit()
+            return None
+        if response is None:
+            # Side effects committed, then the handler raised; never rerun
+            db.session.rollback()
+            return None
+        # Either nothing was committed (a 4xx) or the route committed
+        # without recording its response; store what it returned
+        stored = _StoredResponse(row.request_hash, response.status_code, response.get_data(as_text=True))
+        row.status = "completed"
+        row.response_status = stored.status
+        row.response_body = stored.body
+        row.completed_at = datetime.utcnow()
+        db.session.commit()
+        return stored
+
+    def _claim(self, scope, key, request_hash):
+        """Insert the pending row; returns its id, or None if another
+        request got there first."""
+        try:
+            row = IdempotencyKey(scope=scope, key=key, request_hash=request_hash)
+            db.session.add(row)
+            db.session.commit()
+            return row.id
+        except IntegrityError:
+            # Lost the race to another worker; re-read its row
+            db.session.rollback()
+            return None
+
+    def _take_over_abandoned(self, row):
+        if row.status != "pending":
+            return False
+        cutoff = datetime.utcnow() - timedelta(seconds=PENDING_TIMEOUT_SECONDS)
+        if row.created_at is None or row.created_at > cutoff:
+            return False
+        # Conditional on the old timestamp so only one worker takes over
+        taken = IdempotencyKey.query \
+            .filter(IdempotencyKey.id == row.id, IdempotencyKey.status == "pending",
+                    IdempotencyKey.created_at == row.created_at) \
+            .update({"created_at": datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        return taken == 1
+
+    def _replay(self, stored, request_hash):
+        if stored.request_hash != request_hash:
+            return jsonify({"error": "Idempotency-Key was already used with a different request"}), 422
+        with self._lock:
+            self.replays += 1
+        return stored.to_response()
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        if now - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        IdempotencyKey.query \
+            .filter(IdempotencyKey.created_at < datetime.utcnow() - self.retention) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cached_responses": len(self._responses),
+                "in_flight": len(self._flights),
+                "executions": self.executions,
+                "replays": self.replays,
+            }
+
+
+def _in_progress():
+    return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+
+
+def _already_processed():
+    return jsonify({"error": "A request with this Idempotency-Key was already processed; its response is unavailable"}), 409
+
+
+idempotency_store = IdempotencyStore(
+    cache_ttl_seconds=app.config['IDEMPOTENCY_CACHE_TTL'],
+    retention_hours=app.config['IDEMPOTENCY_KEY_RETENTION_HOURS'],
+)
+
+
+def record_response(body, status):
+    """Store the response the current route is about to return for its
+    Idempotency-Key (if the request has one), inside the route's own
+    transaction. Call it right before the commit so the side effects and
+    the replayable response commit together."""
+    claim = g.get("idempotency_claim") if has_request_context() else None
+    if claim is None:
+        return
+    db.session.execute(
+        db.update(IdempotencyKey).where(IdempotencyKey.id == claim).values(
+            status="completed",
+            response_status=status,
+            response_body=jsonify(body).get_data(as_text=True),
+            completed_at=datetime.utcnow(),
+        )
+    )
+
+
+@event.listens_for(db.session, "before_commit")
+def _mark_committed(session):
+    """A handler running under a claimed key is committing side effects
+    without having recorded its response: flag the key in the same
+    transaction so it is never taken over and run a second time."""
+    claim = g.get("idempotency_claim") if has_request_context() else None
+    if claim is None:
+        return
+    session.execute(
+        db.update(IdempotencyKey)
+        .where(IdempotencyKey.id == claim, IdempotencyKey.status == "pending")
+        .values(status="committed")
+    )
+
+
+def _request_hash():
+    """Hash of the request's JSON payload, canonicalised so key order and
+    whitespace do not make a retry look like a different request (the raw
+    body is hashed when it is not JSON)."""
+    payload = request.get_json(silent=True)
+    if payload is None:
+        body = request.get_data()
+    else:
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(body).hexdigest()
+
+
+def idempotent(scope):
+    """Honour an optional Idempotency-Key header on a create endpoint:
+    repeats of a key replay the first response instead of running again."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({"error": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+            return idempotency_store.run(scope, key, _request_hash(), lambda: view(*args, **kwargs))
+        return wrapper
+    return decorator
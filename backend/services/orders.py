@@ -0,0 +1,169 @@
+# backend/services/orders.py
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import load_only, selectinload
+
+from app import db
+from models.order import Order
+from models.order_archive import ArchivedOrder
+from models.product import Product
+
+ORDER_STATUSES = ("Pending", "Processing", "Shipped", "Delivered", "Cancelled")
+# Orders in these statuses can no longer change status (single or bulk updates)
+TERMINAL_ORDER_STATUSES = ("Delivered", "Cancelled")
+
+# Fields of the single-order view ("products" is the line items)
+ORDER_FIELDS = (
+    "id", "username", "payment_id", "first_name", "last_name", "address1", "address2",
+    "country", "state", "city", "zip_code", "phone_number", "subtotal_amount",
+    "sales_tax_amount", "shipping_fee", "total_amount", "status", "created_at", "products"
+)
+# Fields of the order list view, all served from the orders row
+# ("product_count" is the legacy name of item_count)
+ORDER_SUMMARY_FIELDS = (
+    "id", "username", "payment_id", "first_name", "last_name", "status",
+    "total_amount", "created_at", "product_count", "item_count", "unit_count", "preview"
+)
+# Line items kept in Order.preview
+ORDER_PREVIEW_SIZE = 3
+
+
+def order_to_dict(order, fields):
+    """Serialize the Order columns among `fields` (the "products" line items
+    are added by the caller)."""
+    data = {field: getattr(order, field) for field in fields if field in Order.__table__.columns}
+    if "product_count" in fields:
+        data["product_count"] = order.item_count
+    return data
+
+
+def order_columns(fields, required=("id",), model=Order):
+    """The order columns a fieldset (plus `required`) needs. `model` is
+    Order or ArchivedOrder, which share their columns."""
+    wanted = set(fields).union(required)
+    if "product_count" in wanted:
+        wanted.add("item_count")
+    return [getattr(model, column.name) for column in Order.__table__.columns if column.name in wanted]
+
+
+def order_load_options(fields, required=("id",), model=Order):
+    """Only fetch the order columns a fieldset (plus `required`) needs."""
+    return [load_only(*order_columns(fields, required, model))]
+
+
+def order_summary(items):
+    """item_count/unit_count/preview for an order's line items, given as
+    (product_id, quantity, name, image_url) in line order."""
+    return {
+        "item_count": len(items),
+        "unit_count": sum(quantity for _, quantity, _, _ in items),
+        "preview": [
+            {"product_id": product_id, "product_name": name,
+             "product_image": image_url, "quantity": quantity}
+            for product_id, quantity, name, image_url in items[:ORDER_PREVIEW_SIZE]
+        ],
+    }
+
+
+def order_details_options(model=Order):
+    """Load an order's line items and their products in one extra query
+    (SELECT ... WHERE order_id IN ... joined to products) instead of one
+    query per item."""
+    details_model = model.details.property.mapper.class_
+    return [
+        selectinload(model.details)
+        .joinedload(details_model.product)
+        .load_only(Product.id, Product.name, Product.image_url)
+    ]
+
+
+def order_line_items(order):
+    items = []
+    for detail in order.details:
+        product = detail.product
+        items.append({
+            "product_id": detail.product_id,
+            "product_name": product.name if product else "Unknown Product",
+            "product_image": product.image_url if product else None,
+            "quantity": detail.quantity,
+            "unit_price": detail.unit_price,
+            "subtotal": detail.quantity * detail.unit_price
+        })
+    return items
+
+
+def _parse_datetime(value, key, end_of_range=False):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{key} must be an ISO date or datetime")
+    # A bare date as the upper bound covers that whole day
+    if end_of_range and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def parse_order_filters(args):
+    """Read ?status=, ?created_from= and ?created_to= (ISO dates; the range
+    is [from, to], a bare `to` date being inclusive). Raises ValueError with
+    a user-facing message on malformed input."""
+    filters = {}
+
+    status = args.get("status")
+    if status:
+        if status not in ORDER_STATUSES:
+            raise ValueError(f"status must be one of: {', '.join(ORDER_STATUSES)}")
+        filters["status"] = status
+
+    created_from = args.get("created_from")
+    if created_from:
+        filters["created_from"] = _parse_datetime(created_from, "created_from")
+
+    created_to = args.get("created_to")
+    if created_to:
+        filters["created_to"] = _parse_datetime(created_to, "created_to", end_of_range=True)
+        filters["created_to_exclusive"] = len(created_to) == 10
+
+    return filters
+
+
+def apply_order_filters(query, filters, model=Order):
+    if "status" in filters:
+        query = query.filter(model.status == filters["status"])
+    if "created_from" in filters:
+        query = query.filter(model.created_at >= filters["created_from"])
+    if "created_to" in filters:
+        if filters["created_to_exclusive"]:
+            query = query.filter(model.created_at < filters["created_to"])
+        else:
+            query = query.filter(model.created_at <= filters["created_to"])
+    return query
+
+
+def apply_order_sort(query, after=None, model=Order):
+    """Newest first, tie-broken on id; seek past the (created_at, id) of the
+    previous page's last order instead of using OFFSET."""
+    if after is not None:
+        query = query.filter(db.tuple_(model.created_at, model.id) < tuple(after))
+    return query.order_by(model.created_at.desc(), model.id.desc())
+
+
+def order_history(select_for, after=None, limit=None, models=(Order, ArchivedOrder)):
+    """Rows of live and archived orders, newest first, in one statement.
+
+    select_for(model) selects the same columns (including created_at and
+    id) from Order or ArchivedOrder; each branch seeks and stops on its own
+    (created_at, id) index before the UNION ALL is merged. An order is
+    never in both tables at once (archive_orders.py moves it in one
+    transaction), so no row is repeated."""
+    branches = []
+    for model in models:
+        branch = apply_order_sort(select_for(model), after, model)
+        if limit is not None:
+            branch = branch.limit(limit)
+        branches.append(branch)
+    history = db.union_all(*branches).subquery()
+    stmt = db.select(history).order_by(history.c.created_at.desc(), history.c.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return db.session.execute(stmt).all()
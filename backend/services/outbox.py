@@ -0,0 +1,309 @@
+# backend/services/outbox.py
+# Transactional outbox for order lifecycle events. Routes add events to the
+# session with record_*() before committing, so an event exists if and only
+# if its order change was committed. A background dispatcher then delivers
+# them to in-process consumers registered with subscribe(). Events of a type
+# nobody subscribes to are stored as "skipped" and never dispatched; delivered
+# and skipped events are purged after OUTBOX_RETENTION_HOURS.
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import aliased
+
+from app import app, db
+from models.outbox_event import OutboxEvent
+
+ORDER_CREATED = "order.created"
+ORDER_STATUS_CHANGED = "order.status_changed"
+ORDER_CANCELLED = "order.cancelled"
+
+BATCH_SIZE = 100
+POLL_INTERVAL_SECONDS = 1.0
+# After this many failed deliveries an event is parked as "failed" until
+# requeue_failed() puts it back
+MAX_ATTEMPTS = 10
+# Wait before retry n: RETRY_BASE_SECONDS * 2 ** (n - 1), at most RETRY_MAX_SECONDS
+RETRY_BASE_SECONDS = 2
+RETRY_MAX_SECONDS = 600
+# Only one worker dispatches at a time (PostgreSQL advisory lock key)
+DISPATCH_LOCK_KEY = 0x6f7574626f78
+# Old delivered/skipped events are deleted in batches of this size
+PURGE_BATCH_SIZE = 1000
+PURGE_INTERVAL_SECONDS = 3600
+
+
+# ---- recording (inside the caller's transaction) ----
+
+def record_event(event_type, order_id, payload):
+    event = OutboxEvent(event_type=event_type, order_id=order_id, payload=payload)
+    if not _has_consumer(event_type):
+        # Kept for the record, but the dispatcher never polls it
+        event.status = "skipped"
+    db.session.add(event)
+
+
+def record_order_created(order, quantities):
+    record_event(ORDER_CREATED, order.id, {
+        "order_id": order.id,
+        "username": order.username,
+        "total_amount": order.total_amount,
+        "items": [{"product_id": product_id, "quantity": quantity}
+                  for product_id, quantity in quantities.items()],
+    })
+
+
+def record_status_change(order_id, previous, status):
+    payload = {"order_id": order_id, "from": previous, "to": status}
+    record_event(ORDER_STATUS_CHANGED, order_id, payload)
+    if status == "Cancelled":
+        record_event(ORDER_CANCELLED, order_id, payload)
+
+
+# ---- consumers ----
+
+_consumers = {}  # event type ("*" for all) -> [callable(event_type, payload)]
+
+
+def subscribe(event_type="*"):
+    """Register a consumer for an event type. Consumers run inside the
+    dispatch transaction (in a savepoint per event), so database writes
+    they make commit together with the event's "dispatched" mark. Other
+    side effects are at least once: consumers must tolerate seeing the
+    same event id twice."""
+    def decorator(consumer):
+        _consumers.setdefault(event_type, []).append(consumer)
+        return consumer
+    return decorator
+
+
+def consumers(event_type):
+    """The consumers an event of event_type is delivered to."""
+    return _consumers.get(event_type, []) + _consumers.get("*", [])
+
+
+def _has_consumer(event_type):
+    return bool(consumers(event_type))
+
+
+def _deliver(event):
+    for consumer in consumers(event.event_type):
+        consumer(event.event_type, dict(event.payload, event_id=event.id))
+
+
+def _routed():
+    """Filter for events some consumer wants, or None when there are no
+    consumers. Events nobody consumes are never marked dispatched."""
+    if not _consumers:
+        return None
+    if "*" in _consumers:
+        return db.true()
+    return OutboxEvent.event_type.in_(list(_consumers))
+
+
+def _retry_delay(attempts):
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+def requeue_failed(event_ids=None):
+    """Put parked ("failed") events back in the queue with a fresh attempt
+    budget; all of them, or only event_ids. Inside the caller's
+    transaction; returns how many were requeued."""
+    stmt = db.update(OutboxEvent).where(OutboxEvent.status == "failed")
+    if event_ids:
+        stmt = stmt.where(OutboxEvent.id.in_(event_ids))
+    return db.session.execute(
+        stmt.values(status="pending", attempts=0, next_attempt_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+# ---- dispatcher ----
+
+class OutboxDispatcher:
+    def __init__(self):
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dispatched = 0
+        self.failures = 0
+        self.parked = 0
+        self.batches = 0
+        self.purged = 0
+        self.last_lag_seconds = None  # created -> dispatched, newest delivered event
+        self._last_purge = 0.0
+
+    def start(self, app):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(app,), name="outbox-dispatcher", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Deliver soon instead of waiting for the next poll (call after commit)."""
+        self._wake.set()
+
+    def _run(self, app):
+        while True:
+            self._wake.wait(POLL_INTERVAL_SECONDS)
+            self._wake.clear()
+            with app.app_context():
+                try:
+                    # Keep draining while batches come back full. Failed
+                    # events are rescheduled or parked, so a full batch of
+                    # failures is not picked up again straight away.
+                    while self.dispatch_batch() == BATCH_SIZE:
+                        pass
+                    if time.monotonic() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+                        self._last_purge = time.monotonic()
+                        self.skip_unrouted()
+                        while self.purge_batch() == PURGE_BATCH_SIZE:
+                            pass
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error dispatching outbox events: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    def _acquire_lock(self):
+        if db.engine.dialect.name != "postgresql":
+            return True
+        # Transaction-scoped: released by the commit at the end of the batch
+        return db.session.execute(
+            db.text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": DISPATCH_LOCK_KEY}
+        ).scalar()
+
+    def _due_events(self, routed, now):
+        """Pending events that are due, in id order, skipping any event
+        queued behind an earlier undelivered event of the same order (one
+        parked as failed or waiting for a retry)."""
+        earlier = aliased(OutboxEvent)
+        blocked = db.select(earlier.id).where(
+            earlier.order_id == OutboxEvent.order_id,
+            earlier.id < OutboxEvent.id,
+            db.or_(
+                earlier.status == "failed",
+                db.and_(earlier.status == "pending", earlier.next_attempt_at > now),
+            ),
+        )
+        return OutboxEvent.query.filter(
+            OutboxEvent.status == "pending",
+            db.or_(OutboxEvent.next_attempt_at.is_(None), OutboxEvent.next_attempt_at <= now),
+            routed,
+            ~blocked.exists(),
+        ).order_by(OutboxEvent.id).limit(BATCH_SIZE).all()
+
+    def dispatch_batch(self):
+        """Deliver up to BATCH_SIZE due events in id order. Returns the
+        number of events examined.
+
+        An event is marked dispatched only after every consumer accepted it.
+        A failed delivery is retried with exponential backoff and parked as
+        "failed" after MAX_ATTEMPTS; until it is delivered, later events of
+        the same order are held back so per-order ordering is preserved.
+        """
+        routed = _routed()
+        if routed is None or not self._acquire_lock():
+            db.session.rollback()
+            return 0
+
+        now = datetime.utcnow()
+        events = self._due_events(routed, now)
+
+        blocked_orders = set()
+        dispatched = failures = parked = 0
+        lag = None
+        for event in events:
+            if event.order_id in blocked_orders:
+                continue
+            try:
+                with db.session.begin_nested():
+                    _deliver(event)
+            except Exception as e:
+                event.attempts = (event.attempts or 0) + 1
+                event.last_error = str(e)
+                failures += 1
+                blocked_orders.add(event.order_id)
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = "failed"
+                    parked += 1
+                    print(f"Error delivering outbox event {event.id}, parking it: {str(e)}")
+                else:
+                    event.next_attempt_at = now + timedelta(seconds=_retry_delay(event.attempts))
+                continue
+            event.status = "dispatched"
+            event.dispatched_at = datetime.utcnow()
+            lag = (event.dispatched_at - event.created_at).total_seconds()
+            dispatched += 1
+
+        db.session.commit()
+
+        with self._lock:
+            self.batches += 1
+            self.dispatched += dispatched
+            self.failures += failures
+            self.parked += parked
+            if lag is not None:
+                self.last_lag_seconds = lag
+        return len(events)
+
+    def skip_unrouted(self):
+        """Mark pending events that no consumer wants as skipped (events
+        recorded before a consumer was removed, or by an older release)."""
+        routed = _routed()
+        stmt = db.update(OutboxEvent).where(OutboxEvent.status == "pending")
+        if routed is not None:
+            stmt = stmt.where(~routed)
+        skipped = db.session.execute(
+            stmt.values(status="skipped").execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return skipped
+
+    def purge_batch(self):
+        """Delete up to PURGE_BATCH_SIZE dispatched or skipped events older
+        than OUTBOX_RETENTION_HOURS. Failed and pending events are kept."""
+        cutoff = datetime.utcnow() - timedelta(hours=app.config['OUTBOX_RETENTION_HOURS'])
+        expired = db.select(OutboxEvent.id) \
+            .where(OutboxEvent.status.in_(("dispatched", "skipped")), OutboxEvent.created_at < cutoff) \
+            .order_by(OutboxEvent.id).limit(PURGE_BATCH_SIZE)
+        deleted = db.session.execute(
+            db.delete(OutboxEvent).where(OutboxEvent.id.in_(expired.scalar_subquery()))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        with self._lock:
+            self.purged += deleted
+        return deleted
+
+    def stats(self):
+        """Dispatcher counters for this worker plus the shared backlog."""
+        routed = _routed()
+        pending, oldest = db.session.query(
+            db.func.count(OutboxEvent.id), db.func.min(OutboxEvent.created_at)
+        ).filter(OutboxEvent.status == "pending", routed if routed is not None else db.false()).one()
+        skipped = db.session.query(db.func.count(OutboxEvent.id)) \
+            .filter(OutboxEvent.status == "skipped").scalar()
+        retrying = db.session.query(db.func.count(OutboxEvent.id)) \
+            .filter(OutboxEvent.status == "pending", OutboxEvent.next_attempt_at > datetime.utcnow()).scalar()
+        failed = db.session.query(db.func.count(OutboxEvent.id)) \
+            .filter(OutboxEvent.status == "failed").scalar()
+        with self._lock:
+            return {
+                "running": self._thread is not None,
+                "pending": pending,
+                "retrying": retrying,
+                "failed": failed,
+                "skipped": skipped,
+                "oldest_pending_age_seconds":
+                    round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0,
+                "last_delivery_lag_seconds":
+                    round(self.last_lag_seconds, 3) if self.last_lag_seconds is not None else None,
+                "dispatched": self.dispatched,
+                "delivery_failures": self.failures,
+                "parked": self.parked,
+                "batches": self.batches,
+                "purged": self.purged,
+            }
+
+
+outbox_dispatcher = OutboxDispatcher()
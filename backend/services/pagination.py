@@ -0,0 +1,56 @@
+# backend/services/pagination.py
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def parse_limit(raw_limit, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a ?limit= value and clamp it to [1, maximum]."""
+    if raw_limit in (None, ""):
+        return default
+    try:
+        limit = int(raw_limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(sort, values):
+    """Encode the sort key of the last row of a page into an opaque token.
+
+    Datetimes are stored as ISO strings and restored by decode_cursor so the
+    keyset comparison uses the same type as the column.
+    """
+    payload = {
+        "s": sort,
+        "v": [
+            {"dt": value.isoformat()} if isinstance(value, datetime) else value
+            for value in values
+        ],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, sort):
+    """Decode a token from encode_cursor; the sort it was issued for must match."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if payload.get("s") != sort:
+            raise InvalidCursor("Cursor does not match the requested sort")
+        return [
+            datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+            for value in payload["v"]
+        ]
+    except InvalidCursor:
+        raise
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
@@ -0,0 +1,78 @@
+# backend/services/rollups.py
+# Incremental maintenance of sales_rollups, driven by the order outbox: sales
+# are added when an order.created event is delivered and subtracted on
+# order.cancelled. Consumers run in the dispatcher's transaction, so each
+# event is applied exactly once, and checkouts never wait on the per-product
+# rollup rows. The rollups trail committed orders by the dispatch delay.
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from models.order import Order
+from models.order_details import OrderDetails
+from models.product import Product
+from models.sales_rollup import SalesRollup
+from services import outbox
+
+# Dimensions the analytics endpoint can group by
+ROLLUP_DIMENSIONS = {
+    "day": SalesRollup.day,
+    "vendor": SalesRollup.vendor_id,
+    "product": SalesRollup.product_id,
+    "category": SalesRollup.category,
+}
+
+
+def _order_lines(order_ids, sign):
+    """(day, product_id, vendor_id, category, units, revenue, order_lines)
+    per product per order day for the given orders, multiplied by sign."""
+    return db.select(
+        db.cast(Order.created_at, db.Date).label("day"),
+        OrderDetails.product_id,
+        Product.vendor_id,
+        Product.category,
+        (sign * db.func.sum(OrderDetails.quantity)).label("units"),
+        (sign * db.func.sum(OrderDetails.quantity * OrderDetails.unit_price)).label("revenue"),
+        (sign * db.func.count(OrderDetails.id)).label("order_lines"),
+    ).select_from(OrderDetails) \
+        .join(Order, Order.id == OrderDetails.order_id) \
+        .outerjoin(Product, Product.id == OrderDetails.product_id) \
+        .where(OrderDetails.order_id.in_(order_ids)) \
+        .group_by(db.cast(Order.created_at, db.Date), OrderDetails.product_id, Product.vendor_id, Product.category)
+
+
+def _upsert(order_ids, sign):
+    if not order_ids:
+        return
+    stmt = insert(SalesRollup).from_select(
+        ["day", "product_id", "vendor_id", "category", "units", "revenue", "order_lines"],
+        _order_lines(order_ids, sign)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SalesRollup.day, SalesRollup.product_id],
+        set_={
+            "units": SalesRollup.units + stmt.excluded.units,
+            "revenue": SalesRollup.revenue + stmt.excluded.revenue,
+            "order_lines": SalesRollup.order_lines + stmt.excluded.order_lines,
+        }
+    )
+    db.session.execute(stmt)
+
+
+def record_orders(order_ids):
+    """Add the line items of newly created orders."""
+    _upsert(order_ids, 1)
+
+
+def reverse_orders(order_ids):
+    """Subtract the line items of cancelled orders."""
+    _upsert(order_ids, -1)
+
+
+@outbox.subscribe(outbox.ORDER_CREATED)
+def on_order_created(event_type, payload):
+    record_orders([payload["order_id"]])
+
+
+@outbox.subscribe(outbox.ORDER_CANCELLED)
+def on_order_cancelled(event_type, payload):
+    reverse_orders([payload["order_id"]])
@@ -0,0 +1,431 @@
+# backend/services/search_index.py
+import bisect
+import heapq
+import math
+from operator import itemgetter
+import re
+import threading
+import time
+from datetime import timedelta
+
+from app import db
+from models.product import Product
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {"a", "an", "and", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+# BM25 weights each field's term frequency before length normalisation, so a
+# hit in the name counts more than one buried in the description.
+FIELD_WEIGHTS = (("name", 3.0), ("category", 2.0), ("description", 1.0))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Query terms shorter than this are matched exactly/by prefix only
+FUZZY_MIN_LENGTH = 4
+FUZZY_PENALTY = 0.6
+PREFIX_PENALTY = 0.8
+PREFIX_MIN_LENGTH = 2
+# Expansions kept per query term (shortest completions first) and
+# how far into the vocabulary to look for them
+MAX_PREFIX_EXPANSIONS = 20
+PREFIX_SCAN_LIMIT = 500
+
+# How often a worker checks the database for writes made by other workers
+REFRESH_INTERVAL_SECONDS = 30
+# updated_at is the writing transaction's start time, so a row can commit
+# after rows stamped later; each refresh re-reads this far behind the
+# watermark to pick up such late commits
+REFRESH_OVERLAP_SECONDS = 60
+
+INDEX_COLUMNS = [
+    Product.id, Product.name, Product.description, Product.category,
+    Product.vendor_id, Product.price, Product.stock, Product.active, Product.updated_at,
+]
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _deletes(term):
+    """All variants of term with one character removed (SymSpell-style)."""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a, b):
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        # Adjacent transposition ("shoe" / "sheo")
+        return (len(diffs) == 2 and diffs[1] == diffs[0] + 1
+                and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]])
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class ProductSearchIndex:
+    """In-memory inverted index over active products' name, category and
+    description with BM25 ranking, prefix expansion of every query term
+    and one-edit typo tolerance.
+
+    Each worker process holds its own copy: it is built on first use,
+    updated directly by the write routes of this process (see
+    services.catalog_events) and periodically catches up on writes made by
+    other workers via products.updated_at.
+    """
+
+    # Index contents, swapped as a whole by rebuild()
+    _STATE = ("postings", "doc_lengths", "doc_norms", "doc_terms", "doc_meta", "category_docs",
+              "vendor_docs", "in_stock_docs", "sorted_terms", "delete_map", "total_length",
+              "norm_average_length", "watermark")
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Serialises database syncs (rebuild/refresh); their queries run
+        # without _lock so searches and upserts are not blocked meanwhile
+        self._sync_lock = threading.RLock()
+        # Local changes made while a sync is reading, replayed on its result
+        self._pending = None
+        self._reset()
+        self.built = False
+        self._last_refresh = 0.0
+
+    def _reset(self):
+        self.postings = {}      # term -> {product_id: weighted term frequency}
+        self.doc_lengths = {}   # product_id -> weighted document length
+        self.doc_norms = {}     # product_id -> BM25 length normalisation
+        self.doc_terms = {}     # product_id -> terms, for removal
+        self.doc_meta = {}      # product_id -> (category, vendor_id, price, stock)
+        # Filter sets so category/vendor/stock filters are set intersections
+        self.category_docs = {}
+        self.vendor_docs = {}
+        self.in_stock_docs = set()
+        self.sorted_terms = []  # vocabulary, sorted for prefix lookups
+        self.delete_map = {}    # one-deletion variant -> set of terms
+        self.total_length = 0.0
+        # Average length used for norms; fixed between rebuilds so an upsert
+        # does not have to renormalise every document
+        self.norm_average_length = None
+        self.watermark = None   # newest updated_at seen
+
+    # ---- building and maintenance ----
+
+    def rebuild(self, batches):
+        """Replace the index contents with rows of INDEX_COLUMNS.
+
+        The new index is built off to the side and swapped in, so searches
+        keep being served from the old one meanwhile.
+        """
+        with self._sync_lock:
+            self._begin_sync()
+            try:
+                fresh = ProductSearchIndex()
+                for batch in batches:
+                    for row in batch:
+                        fresh._upsert_row(row)
+                fresh._renormalise()
+                with self._lock:
+                    for change in self._pending:
+                        change(fresh)
+                    for attribute in self._STATE:
+                        setattr(self, attribute, getattr(fresh, attribute))
+                    self.built = True
+                    self._last_refresh = time.monotonic()
+            finally:
+                self._end_sync()
+
+    def _begin_sync(self):
+        with self._lock:
+            self._pending = []
+
+    def _end_sync(self):
+        with self._lock:
+            self._pending = None
+
+    def _apply(self, change):
+        """Apply change(index) now and, while a sync is reading the
+        database, again on top of what it read."""
+        with self._lock:
+            change(self)
+            if self._pending is not None:
+                self._pending.append(change)
+
+    def _renormalise(self):
+        if not self.doc_lengths:
+            return
+        average_length = self.total_length / len(self.doc_lengths) or 1.0
+        self.norm_average_length = average_length
+        for product_id, length in self.doc_lengths.items():
+            self.doc_norms[product_id] = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+
+    def upsert(self, fields):
+        """Index (or re-index) a product from a dict of INDEX_COLUMNS
+        values; inactive products are dropped."""
+        row = tuple(fields[column.key] for column in INDEX_COLUMNS)
+        self._apply(lambda index: index._upsert_row(row))
+
+    def remove(self, product_id):
+        self._apply(lambda index: index._remove_doc(product_id))
+
+    def update_stock(self, product_id, stock):
+        self._apply(lambda index: index._set_stock(product_id, stock))
+
+    def _set_stock(self, product_id, stock):
+        meta = self.doc_meta.get(product_id)
+        if meta is not None:
+            self.doc_meta[product_id] = meta[:3] + (stock,)
+            if (stock or 0) > 0:
+                self.in_stock_docs.add(product_id)
+            else:
+                self.in_stock_docs.discard(product_id)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def _upsert_row(self, row):
+        product_id, name, description, category, vendor_id, price, stock, active, updated_at = row
+        self._remove_doc(product_id)
+        if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+            self.watermark = updated_at
+        if not active:
+            return
+
+        frequencies = {}
+        length = 0.0
+        fields = {"name": name, "category": category, "description": description}
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(fields[field]):
+                frequencies[token] = frequencies.get(token, 0.0) + weight
+                length += weight
+
+        for term, frequency in frequencies.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self._add_term(term)
+            postings[product_id] = frequency
+
+        self.doc_terms[product_id] = tuple(frequencies)
+        self.doc_lengths[product_id] = length
+        average_length = self.norm_average_length or length or 1.0
+        self.doc_norms[product_id] = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+        self.doc_meta[product_id] = (category, vendor_id, price, stock)
+        self.category_docs.setdefault(category, set()).add(product_id)
+        self.vendor_docs.setdefault(vendor_id, set()).add(product_id)
+        if (stock or 0) > 0:
+            self.in_stock_docs.add(product_id)
+        self.total_length += length
+
+    def _remove_doc(self, product_id):
+        terms = self.doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self.postings[term]
+                self._drop_term(term)
+        self.total_length -= self.doc_lengths.pop(product_id)
+        del self.doc_norms[product_id]
+        category, vendor_id, _, _ = self.doc_meta.pop(product_id)
+        self._discard_from(self.category_docs, category, product_id)
+        self._discard_from(self.vendor_docs, vendor_id, product_id)
+        self.in_stock_docs.discard(product_id)
+
+    @staticmethod
+    def _discard_from(groups, key, product_id):
+        docs = groups.get(key)
+        if docs is not None:
+            docs.discard(product_id)
+            if not docs:
+                del groups[key]
+
+    def _add_term(self, term):
+        bisect.insort(self.sorted_terms, term)
+        if len(term) >= FUZZY_MIN_LENGTH:
+            for variant in _deletes(term) | {term}:
+                self.delete_map.setdefault(variant, set()).add(term)
+
+    def _drop_term(self, term):
+        position = bisect.bisect_left(self.sorted_terms, term)
+        if position < len(self.sorted_terms) and self.sorted_terms[position] == term:
+            del self.sorted_terms[position]
+        if len(term) >= FUZZY_MIN_LENGTH:
+            for variant in _deletes(term) | {term}:
+                terms = self.delete_map.get(variant)
+                if terms is not None:
+                    terms.discard(term)
+                    if not terms:
+                        del self.delete_map[variant]
+
+    # ---- querying ----
+
+    def _expand(self, token):
+        """Map a query token to {index term: weight multiplier}."""
+        expansions = {}
+        if token in self.postings:
+            expansions[token] = 1.0
+
+        if len(token) >= PREFIX_MIN_LENGTH:
+            start = bisect.bisect_left(self.sorted_terms, token)
+            completions = []
+            for term in self.sorted_terms[start:start + PREFIX_SCAN_LIMIT]:
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    completions.append(term)
+            for term in sorted(completions, key=len)[:MAX_PREFIX_EXPANSIONS]:
+                expansions[term] = PREFIX_PENALTY
+
+        if not expansions and len(token) >= FUZZY_MIN_LENGTH:
+            candidates = set()
+            for variant in _deletes(token) | {token}:
+                candidates |= self.delete_map.get(variant, set())
+            for term in candidates:
+                if _within_one_edit(token, term):
+                    expansions[term] = FUZZY_PENALTY
+        return expansions
+
+    def _apply_filters(self, candidates, filters):
+        if "category" in filters:
+            candidates &= self.category_docs.get(filters["category"], set())
+        if "vendor_id" in filters:
+            candidates &= self.vendor_docs.get(filters["vendor_id"], set())
+        if filters.get("in_stock"):
+            candidates &= self.in_stock_docs
+        if "exclude" in filters:
+            candidates.discard(filters["exclude"])
+        if "min_price" in filters or "max_price" in filters:
+            min_price = filters.get("min_price", float("-inf"))
+            max_price = filters.get("max_price", float("inf"))
+            meta = self.doc_meta
+            candidates = {d for d in candidates if min_price <= meta[d][2] <= max_price}
+        return candidates
+
+    def search(self, query, filters=None, limit=20, offset=0):
+        """Return (total matches, [(product_id, score), ...]) for one page.
+
+        Every query token has to match (exactly, by prefix, or within one
+        edit), so "runn shoe" finds what "shoe runn" does; documents are
+        ranked by BM25.
+        """
+        filters = filters or {}
+        tokens = tokenize(query)
+        if not tokens:
+            return 0, []
+
+        with self._lock:
+            doc_count = len(self.doc_lengths)
+            if not doc_count:
+                return 0, []
+
+            expanded = [self._expand(token) for token in tokens]
+            if not all(expanded):
+                return 0, []
+
+            # Start from the rarest token and probe the others' postings so
+            # the work is bounded by the smallest candidate set
+            ordered = sorted(expanded, key=lambda e: sum(len(self.postings[t]) for t in e))
+            candidates = set()
+            for term in ordered[0]:
+                candidates.update(self.postings[term])
+            for expansions in ordered[1:]:
+                term_postings = [self.postings[term] for term in expansions]
+                candidates = {d for d in candidates if any(d in p for p in term_postings)}
+                if not candidates:
+                    return 0, []
+
+            if filters:
+                candidates = self._apply_filters(candidates, filters)
+            if not candidates:
+                return 0, []
+
+            scores = dict.fromkeys(candidates, 0.0)
+            for expansions in expanded:
+                for term, multiplier in expansions.items():
+                    postings = self.postings[term]
+                    df = len(postings)
+                    idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5)) * multiplier
+                    # Walk whichever side is smaller: prefix expansions make
+                    # many short postings lists against a large candidate set
+                    if len(postings) < len(scores):
+                        pairs = [(d, tf) for d, tf in postings.items() if d in scores]
+                    else:
+                        pairs = [(d, postings[d]) for d in scores if d in postings]
+                    weight = idf * (BM25_K1 + 1)
+                    norms = self.doc_norms
+                    for product_id, tf in pairs:
+                        scores[product_id] += weight * tf / (tf + norms[product_id])
+
+            top = heapq.nlargest(offset + limit, scores.items(), key=itemgetter(1))
+            return len(scores), top[offset:]
+
+    # ---- database sync ----
+
+    def ensure_built(self):
+        if not self.built:
+            with self._sync_lock:
+                if not self.built:
+                    self.rebuild(_index_batches())
+        elif time.monotonic() - self._last_refresh > REFRESH_INTERVAL_SECONDS:
+            self.refresh()
+
+    def refresh(self):
+        """Catch up on writes made by other workers since the watermark
+        (less REFRESH_OVERLAP_SECONDS). The queries run without the index
+        lock; their rows are applied under it, followed by local changes
+        made meanwhile. Skipped if another request is already syncing.
+
+        Deletions are not visible through updated_at, so a drift in the
+        active product count falls back to a full rebuild.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_refresh = time.monotonic()
+            self._begin_sync()
+            try:
+                rows = []
+                if self.watermark is not None:
+                    since = self.watermark - timedelta(seconds=REFRESH_OVERLAP_SECONDS)
+                    rows = db.session.execute(db.select(*INDEX_COLUMNS).where(Product.updated_at >= since)).all()
+                active_count = db.session.query(db.func.count(Product.id)).filter(Product.active.is_(True)).scalar()
+                with self._lock:
+                    for row in rows:
+                        self._upsert_row(tuple(row))
+                    for change in self._pending:
+                        change(self)
+                    drifted = active_count != len(self.doc_lengths)
+            finally:
+                self._end_sync()
+            if drifted:
+                self.rebuild(_index_batches())
+        finally:
+            self._sync_lock.release()
+
+
+def _index_batches(batch_size=5000):
+    stmt = db.select(*INDEX_COLUMNS).where(Product.active.is_(True)).order_by(Product.id)
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        for batch in result.partitions():
+            yield batch
+    finally:
+        result.close()
+
+
+product_search_index = ProductSearchIndex()
+
@@ -0,0 +1,182 @@
+# backend/services/stock.py
+from app import db
+from models.order_details import OrderDetails
+from models.product import Product
+from services import stock_shards
+from services.holds import held_by_others
+
+
+class StockError(Exception):
+    """A reservation could not be made; the message is safe to return to
+    the client."""
+
+    def __init__(self, message, product_id=None):
+        super().__init__(message)
+        self.product_id = product_id
+
+
+def parse_order_items(items):
+    """Validate [{"product_id", "quantity", ...}] and sum quantities per
+    product. Raises StockError on malformed items."""
+    quantities = {}
+    for item in items:
+        product_id = item.get("product_id")
+        quantity = item.get("quantity")
+        if not product_id or not quantity:
+            raise StockError("Each product must have product_id and quantity")
+        try:
+            product_id = int(product_id)
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            raise StockError("product_id and quantity must be integers")
+        if quantity <= 0:
+            raise StockError("quantity must be positive", product_id)
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def stock_levels(product_ids):
+    """{product_id: (stock, active)} for the ids that exist, in one query.
+    Hot products report the sum of their stock shards."""
+    if not product_ids:
+        return {}
+    rows = db.session.execute(
+        db.select(Product.id, stock_shards.effective_stock(), Product.active).where(Product.id.in_(product_ids))
+    )
+    return {product_id: (stock, active) for product_id, stock, active in rows}
+
+
+def apply_stock_deltas(deltas, require_active=False, respect_holds=False, hold_token=None):
+    """Add {product_id: delta} to stock inside the caller's transaction.
+
+    Ordinary products are updated in one statement:
+
+        UPDATE products SET stock = stock + d.delta
+        FROM (VALUES (:id, :delta), ...) AS d (product_id, delta)
+        WHERE products.id = d.product_id AND products.stock + d.delta >= 0
+
+    The rows are locked first with SELECT ... ORDER BY id FOR UPDATE, so
+    concurrent batches always lock in the same order and cannot deadlock.
+    Hot products (services.stock_shards) never take the products row lock;
+    their deltas go to one of their stock shards instead.
+
+    Products whose guard fails (missing, would go negative, or inactive
+    with require_active) are left untouched and reported back. With
+    respect_holds the guard also keeps back units held by other carts
+    (every cart but hold_token's).
+
+    Returns ({product_id: (id, vendor_id, stock, name, image_url)} for the
+    updated products, [failed product ids]). Callers wanting all or
+    nothing roll back when the failed list is not empty.
+    """
+    if not deltas:
+        return {}, []
+    options = {"require_active": require_active, "respect_holds": respect_holds, "hold_token": hold_token}
+    hot = stock_shards.sharded_ids(deltas)
+    updated, failed = _apply_row_deltas(
+        {product_id: delta for product_id, delta in deltas.items() if product_id not in hot}, **options
+    )
+    # A product that turned hot since the check fails the stock_shards guard
+    if failed:
+        hot |= stock_shards.sharded_ids(failed)
+        failed = [product_id for product_id in failed if product_id not in hot]
+    if hot:
+        shard_updated, shard_failed, unsharded = stock_shards.apply_deltas(
+            {product_id: deltas[product_id] for product_id in hot}, **options
+        )
+        updated.update(shard_updated)
+        failed += shard_failed
+        # ... and one that left hot mode since goes back to products.stock
+        if unsharded:
+            row_updated, row_failed = _apply_row_deltas(
+                {product_id: deltas[product_id] for product_id in unsharded}, **options
+            )
+            updated.update(row_updated)
+            failed += row_failed
+    return updated, sorted(failed)
+
+
+def _apply_row_deltas(deltas, require_active, respect_holds, hold_token):
+    """The products.stock half of apply_stock_deltas."""
+    if not deltas:
+        return {}, []
+    product_ids = sorted(deltas)
+    db.session.execute(
+        db.select(Product.id).where(Product.id.in_(product_ids)).order_by(Product.id).with_for_update()
+    )
+
+    source = db.values(
+        db.column("product_id", db.Integer), db.column("delta", db.Integer), name="deltas"
+    ).data([(product_id, deltas[product_id]) for product_id in product_ids])
+    remaining = Product.stock + source.c.delta
+    if respect_holds:
+        remaining = remaining - held_by_others(Product.id, hold_token)
+    conditions = [Product.id == source.c.product_id, remaining >= 0, Product.stock_shards == 0]
+    if require_active:
+        conditions.append(Product.active.is_(True))
+
+    stmt = db.update(Product) \
+        .where(*conditions) \
+        .values(stock=Product.stock + source.c.delta) \
+        .returning(Product.id, Product.vendor_id, Product.stock, Product.name, Product.image_url) \
+        .execution_options(synchronize_session=False)
+    updated = {row.id: row for row in db.session.execute(stmt)}
+    return updated, [product_id for product_id in product_ids if product_id not in updated]
+
+
+def reserve_stock(quantities, hold_token=None):
+    """Decrement stock for {product_id: quantity} inside the caller's
+    transaction, all or nothing.
+
+    One guarded set-based UPDATE (see apply_stock_deltas), so concurrent
+    checkouts can never oversell and never read-modify-write. Units held by
+    other carts are not available; the cart's own holds (hold_token) are,
+    and the caller releases them in the same transaction. On failure
+    StockError is raised for the first failing product and the caller must
+    roll back. Returns the updated (id, vendor_id, stock, name, image_url)
+    rows, keyed by product id.
+    """
+    reserved, failed = apply_stock_deltas(
+        {product_id: -quantity for product_id, quantity in quantities.items()},
+        require_active=True, respect_holds=True, hold_token=hold_token
+    )
+    if failed:
+        raise _reservation_error(failed[0], hold_token)
+    return reserved
+
+
+def _reservation_error(product_id, hold_token=None):
+    product = db.session.get(Product, product_id)
+    if not product:
+        return StockError(f"Product with ID {product_id} not found", product_id)
+    if not product.active:
+        return StockError(f"Product {product.name} is no longer available", product_id)
+    stock = stock_levels([product_id])[product_id][0]
+    available = stock - db.session.execute(db.select(held_by_others(product_id, hold_token))).scalar()
+    return StockError(
+        f"Insufficient stock for product {product.name}. Available: {max(available, 0)}", product_id
+    )
+
+
+def restore_stock_for_orders(order_ids):
+    """Put the units of the given orders back in stock inside the caller's
+    transaction: one aggregated SELECT product_id, sum(quantity) ... GROUP
+    BY product_id, then one apply_stock_deltas batch.
+
+    Product rows are locked in id order, matching reserve_stock, so a
+    restore cannot deadlock with concurrent checkouts; hot products get
+    their units back on a stock shard. Returns the updated (id, vendor_id,
+    stock, ...) rows and {product_id: units restored}.
+    """
+    if not order_ids:
+        return [], {}
+    quantities = {
+        product_id: int(quantity)
+        for product_id, quantity in db.session.execute(
+            db.select(OrderDetails.product_id, db.func.sum(OrderDetails.quantity))
+            .where(OrderDetails.order_id.in_(order_ids)).group_by(OrderDetails.product_id)
+        )
+    }
+    # Products deleted since the order have nothing to restore
+    restored, _ = apply_stock_deltas(quantities)
+    return list(restored.values()), quantities
@@ -0,0 +1,298 @@
+# backend/services/stock_shards.py
+# Hot-product mode for flash sales. A hot product's stock is split across K
+# stock_shards rows; a checkout locks one shard picked at random (skipping
+# shards other checkouts hold) instead of queueing on the single
+# products.stock row lock.
+#
+# While a product is hot (products.stock_shards > 0) the shards hold its real
+# stock and products.stock is a display copy of their sum, refreshed by the
+# rebalancer. services.stock routes every stock write for hot products
+# through apply_deltas() here, so the two never drift.
+import random
+import threading
+import time
+
+from app import db
+from models.product import Product
+from models.stock_shard import StockShard
+from services import catalog_events
+from services import holds
+
+DEFAULT_SHARDS = 8
+MAX_SHARDS = 64
+REBALANCE_INTERVAL_SECONDS = 2
+
+
+def shard_total(product_id):
+    """Scalar subquery (correlated when product_id is a column): the sum of
+    a product's shards."""
+    return db.select(db.func.coalesce(db.func.sum(StockShard.stock), 0)) \
+        .where(StockShard.product_id == product_id).scalar_subquery()
+
+
+def effective_stock():
+    """Column expression for current stock: the shard sum for hot
+    products, products.stock otherwise."""
+    return db.case((Product.stock_shards > 0, shard_total(Product.id)), else_=Product.stock)
+
+
+def sharded_ids(product_ids):
+    """The subset of product_ids in hot mode (one unlocked read)."""
+    if not product_ids:
+        return set()
+    return set(db.session.execute(
+        db.select(Product.id).where(Product.id.in_(list(product_ids)), Product.stock_shards > 0)
+    ).scalars())
+
+
+def _spread(total, count):
+    """Split total units as evenly as possible over count shards."""
+    base, extra = divmod(max(total, 0), count)
+    return [base + (1 if shard < extra else 0) for shard in range(count)]
+
+
+def _lock_product(product_id):
+    return db.session.execute(
+        db.select(Product).where(Product.id == product_id).with_for_update()
+    ).scalar_one_or_none()
+
+
+def _lock_shards(product_id):
+    return db.session.execute(
+        db.select(StockShard.shard, StockShard.stock)
+        .where(StockShard.product_id == product_id).order_by(StockShard.shard).with_for_update()
+    ).all()
+
+
+def _write_shards(product, count, total):
+    db.session.execute(
+        db.delete(StockShard).where(StockShard.product_id == product.id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(db.insert(StockShard), [
+        {"product_id": product.id, "shard": shard, "stock": stock}
+        for shard, stock in enumerate(_spread(total, count))
+    ])
+    product.stock = total
+    product.stock_shards = count
+
+
+# ---- mode changes (inside the caller's transaction) ----
+# Lock order is always product row, then its shards.
+
+def enable_hot_mode(product_id, shards=DEFAULT_SHARDS):
+    """Split the product's stock over `shards` counters (re-split if it is
+    already hot). Returns the product, or None if it does not exist."""
+    product = _lock_product(product_id)
+    if product is None:
+        return None
+    total = sum(stock for _, stock in _lock_shards(product_id)) if product.stock_shards else product.stock
+    _write_shards(product, shards, total or 0)
+    return product
+
+
+def disable_hot_mode(product_id):
+    """Fold the shards back into products.stock and leave hot mode."""
+    product = _lock_product(product_id)
+    if product is None or not product.stock_shards:
+        return product
+    product.stock = sum(stock for _, stock in _lock_shards(product_id))
+    product.stock_shards = 0
+    db.session.execute(
+        db.delete(StockShard).where(StockShard.product_id == product_id)
+        .execution_options(synchronize_session=False)
+    )
+    return product
+
+
+def set_total(product, total):
+    """Set a hot product's stock to an absolute value (vendor edits)."""
+    _lock_product(product.id)
+    _lock_shards(product.id)
+    _write_shards(product, product.stock_shards, total)
+
+
+def rebalance(product_id):
+    """Re-spread a hot product's shards when they have drifted apart (so
+    random picks keep finding stock) and sync products.stock to their sum.
+    Returns (product, stock_changed), with product None when nothing was
+    rewritten."""
+    # Cheap unlocked check first; most intervals there is nothing to do
+    count, low, high, total = db.session.execute(
+        db.select(db.func.count(), db.func.min(StockShard.stock), db.func.max(StockShard.stock),
+                  db.func.sum(StockShard.stock))
+        .where(StockShard.product_id == product_id)
+    ).one()
+    current = db.session.execute(
+        db.select(Product.stock, Product.stock_shards).where(Product.id == product_id)
+    ).one_or_none()
+    if current is None or (current == (total, count) and high - low <= 1):
+        return None, False
+
+    product = _lock_product(product_id)
+    if product is None or not product.stock_shards:
+        return None, False
+    shards = _lock_shards(product_id)
+    total = sum(stock for _, stock in shards)
+    stocks = [stock for _, stock in shards]
+    stock_changed = product.stock != total
+    respread = len(shards) != product.stock_shards or max(stocks) - min(stocks) > 1
+    if respread:
+        _write_shards(product, product.stock_shards, total)
+    product.stock = total
+    if not (respread or stock_changed):
+        return None, False
+    return product, stock_changed
+
+
+# ---- stock writes for hot products (inside the caller's transaction) ----
+
+def _take(product_id, quantity):
+    """Take quantity units from the product's shards. Returns True on
+    success, False when there is not enough, None if it has no shards."""
+    pick = db.select(StockShard.shard) \
+        .where(StockShard.product_id == product_id, StockShard.stock >= quantity) \
+        .order_by(db.func.random()).limit(1)
+    # A free shard that can cover the line; otherwise wait for a busy one
+    shard = db.session.execute(pick.with_for_update(skip_locked=True)).scalar()
+    if shard is None:
+        shard = db.session.execute(pick.with_for_update()).scalar()
+    if shard is not None:
+        db.session.execute(
+            db.update(StockShard)
+            .where(StockShard.product_id == product_id, StockShard.shard == shard)
+            .values(stock=StockShard.stock - quantity)
+            .execution_options(synchronize_session=False)
+        )
+        return True
+
+    # No single shard has enough: take across shards, locked in shard order
+    shards = _lock_shards(product_id)
+    if not shards:
+        return None
+    if sum(stock for _, stock in shards) < quantity:
+        return False
+    remaining = quantity
+    for shard, stock in shards:
+        taken = min(stock, remaining)
+        if taken:
+            db.session.execute(
+                db.update(StockShard)
+                .where(StockShard.product_id == product_id, StockShard.shard == shard)
+                .values(stock=StockShard.stock - taken)
+                .execution_options(synchronize_session=False)
+            )
+            remaining -= taken
+        if not remaining:
+            break
+    return True
+
+
+def _give(product_id, shard_count, quantity):
+    """Add quantity units to a random shard; False if it has no shards."""
+    return db.session.execute(
+        db.update(StockShard)
+        .where(StockShard.product_id == product_id, StockShard.shard == random.randrange(shard_count))
+        .values(stock=StockShard.stock + quantity)
+        .execution_options(synchronize_session=False)
+    ).rowcount > 0
+
+
+def apply_deltas(deltas, require_active=False, respect_holds=False, hold_token=None):
+    """Shard-side counterpart of services.stock.apply_stock_deltas for hot
+    products. Products are handled in id order.
+
+    Returns ({product_id: (id, vendor_id, stock, name, image_url)} for the
+    updated products, [failed ids], [ids that are no longer hot]). The
+    caller applies the last list to products.stock instead. The hold check
+    reads the shards without locking them, so under heavy contention a
+    held cart can lose units to a checkout; stock itself never goes
+    negative.
+    """
+    held = holds.held_by_others(Product.id, hold_token) if respect_holds else db.literal(0)
+    state = {
+        row.id: row for row in db.session.execute(
+            db.select(Product.id, Product.active, Product.stock_shards,
+                      shard_total(Product.id).label("total"), held.label("held"))
+            .where(Product.id.in_(list(deltas)))
+        )
+    }
+
+    done, failed, unsharded = [], [], []
+    for product_id in sorted(deltas):
+        delta = deltas[product_id]
+        row = state.get(product_id)
+        if row is None:
+            failed.append(product_id)
+            continue
+        if not row.stock_shards:
+            unsharded.append(product_id)
+            continue
+        if delta < 0:
+            if (require_active and not row.active) or row.total - row.held + delta < 0:
+                failed.append(product_id)
+                continue
+            taken = _take(product_id, -delta)
+            if taken is None:
+                unsharded.append(product_id)
+                continue
+            if not taken:
+                failed.append(product_id)
+                continue
+        elif delta > 0 and not _give(product_id, row.stock_shards, delta):
+            unsharded.append(product_id)
+            continue
+        done.append(product_id)
+
+    updated = {}
+    if done:
+        updated = {
+            row.id: row for row in db.session.execute(
+                db.select(Product.id, Product.vendor_id, shard_total(Product.id).label("stock"),
+                          Product.name, Product.image_url)
+                .where(Product.id.in_(done))
+            )
+        }
+    return updated, failed, unsharded
+
+
+# ---- background rebalancing ----
+
+class ShardRebalancer:
+    """Every REBALANCE_INTERVAL_SECONDS, re-spreads each hot product's
+    shards and syncs products.stock, each product in its own short
+    transaction. rebalanced counts the products actually rewritten."""
+
+    def __init__(self):
+        self._thread = None
+        self.rebalanced = 0
+
+    def start(self, app):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(app,), name="stock-shard-rebalancer", daemon=True)
+            self._thread.start()
+
+    def _run(self, app):
+        while True:
+            time.sleep(REBALANCE_INTERVAL_SECONDS)
+            with app.app_context():
+                try:
+                    product_ids = db.session.execute(
+                        db.select(Product.id).where(Product.stock_shards > 0)
+                    ).scalars().all()
+                    db.session.rollback()
+                    for product_id in product_ids:
+                        product, stock_changed = rebalance(product_id)
+                        db.session.commit()
+                        if product is not None:
+                            self.rebalanced += 1
+                        if stock_changed:
+                            catalog_events.stock_changed([product])
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error rebalancing stock shards: {str(e)}")
+                finally:
+                    db.session.remove()
+
+
+shard_rebalancer = ShardRebalancer()
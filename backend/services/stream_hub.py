@@ -0,0 +1,168 @@
+# backend/services/stream_hub.py
+# In-process pub/sub for product changes pushed to clients over server-sent
+# events (/api/product/stream). catalog_events publishes every committed
+# stock/price/active change here; each open stream is a subscriber for a
+# set of product ids.
+#
+# A subscriber keeps only the latest state per product, so an idle or slow
+# client costs one small dict no matter how many writes happen, and
+# publishing never blocks on a client.
+#
+# Subscribers live in the worker that serves their stream, but writes land
+# on any worker. Once start() runs (start_background_workers), publish()
+# sends changes through PostgreSQL NOTIFY and a listener thread in every
+# worker hands them to its own subscribers. Changes published while a
+# listener is reconnecting are missed by its streams. Without a listener
+# (scripts, other databases) changes only reach this worker's streams.
+import json
+import select
+import threading
+import time
+
+from app import app, db
+
+NOTIFY_CHANNEL = "product_changes"
+# Deltas per NOTIFY (payloads are limited to 8000 bytes)
+NOTIFY_BATCH_SIZE = 50
+LISTEN_POLL_SECONDS = 5
+LISTEN_RETRY_SECONDS = 1
+
+
+class _Subscriber:
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        self._pending = {}  # product_id -> latest delta
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def push(self, delta):
+        with self._lock:
+            previous = self._pending.get(delta["id"])
+            self._pending[delta["id"]] = dict(previous, **delta) if previous else delta
+        self._ready.set()
+
+    def wait(self, timeout):
+        """Block until something was pushed or timeout; returns the pending
+        deltas (possibly empty) and resets the subscriber."""
+        self._ready.wait(timeout)
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._ready.clear()
+        return list(pending.values())
+
+
+class StreamHub:
+    def __init__(self, max_subscribers):
+        self.max_subscribers = max_subscribers
+        self._by_product = {}  # product_id -> set of _Subscriber
+        self._count = 0
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.rejected = 0
+        self._listener = None
+        self.listening = False
+
+    def subscribe(self, product_ids):
+        """Register interest in product_ids; None when the hub is full."""
+        subscriber = _Subscriber(frozenset(product_ids))
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self._count += 1
+            for product_id in subscriber.product_ids:
+                self._by_product.setdefault(product_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._count -= 1
+            for product_id in subscriber.product_ids:
+                subscribers = self._by_product.get(product_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._by_product[product_id]
+
+    def start(self, app):
+        """Listen for changes published by every worker (PostgreSQL only)."""
+        with app.app_context():
+            if db.engine.dialect.name != "postgresql":
+                print("Product streams only see this worker's changes (LISTEN/NOTIFY needs PostgreSQL)")
+                return
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, args=(app,), name="stream-listener", daemon=True)
+            self._listener.start()
+
+    def _listen(self, app):
+        while True:
+            try:
+                with app.app_context():
+                    connection = db.engine.raw_connection()
+                driver_connection = connection.driver_connection
+                # LISTEN state must not go back to the pool
+                connection.detach()
+                try:
+                    driver_connection.autocommit = True
+                    driver_connection.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    self.listening = True
+                    while True:
+                        if select.select([driver_connection], [], [], LISTEN_POLL_SECONDS)[0]:
+                            driver_connection.poll()
+                            while driver_connection.notifies:
+                                self._deliver(json.loads(driver_connection.notifies.pop(0).payload))
+                finally:
+                    self.listening = False
+                    connection.close()
+            except Exception as e:
+                print(f"Error in product stream listener: {str(e)}")
+                time.sleep(LISTEN_RETRY_SECONDS)
+
+    def publish(self, deltas):
+        """deltas: [{"id": product_id, field: value, ...}]. Call after the
+        change is committed."""
+        if not deltas:
+            return
+        if self._listener is None:
+            self._deliver(deltas)
+            return
+        try:
+            with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                for start in range(0, len(deltas), NOTIFY_BATCH_SIZE):
+                    connection.execute(
+                        db.text("SELECT pg_notify(:channel, :payload)"),
+                        {"channel": NOTIFY_CHANNEL, "payload": json.dumps(deltas[start:start + NOTIFY_BATCH_SIZE])}
+                    )
+        except Exception as e:
+            # At least this worker's streams see the change
+            print(f"Error publishing product changes: {str(e)}")
+            self._deliver(deltas)
+
+    def _deliver(self, deltas):
+        with self._lock:
+            targets = [(delta, list(self._by_product.get(delta["id"], ()))) for delta in deltas]
+            self.published += len(deltas)
+        delivered = 0
+        for delta, subscribers in targets:
+            for subscriber in subscribers:
+                subscriber.push(delta)
+            delivered += len(subscribers)
+        if delivered:
+            with self._lock:
+                self.delivered += delivered
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": self._count,
+                "max_subscribers": self.max_subscribers,
+                "watched_products": len(self._by_product),
+                "published": self.published,
+                "delivered": self.delivered,
+                "rejected": self.rejected,
+                "listening": self.listening,
+            }
+
+
+product_stream_hub = StreamHub(app.config['STREAM_MAX_SUBSCRIBERS'])
@@ -0,0 +1,387 @@
+# backend/services/suggest_index.py
+import bisect
+import heapq
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from flask import current_app
+
+from app import db
+from models.order import Order
+from models.order_details import OrderDetails
+from models.product import Product
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+# A name is also reachable from the start of its 2nd..Nth word
+# ("run" -> "Nike Running Shoes") without indexing every suffix
+MAX_WORD_STARTS = 3
+# Memoised top lists keep spare entries so removals rarely force a rescan
+TOP_LIST_SIZE = 20
+MEMO_MAX_PREFIXES = 50000
+# Prefixes this short match huge ranges; their top lists are built at startup
+WARM_PREFIX_LENGTH = 2
+
+REFRESH_INTERVAL_SECONDS = 30
+# Re-read window behind the watermark (see search_index.REFRESH_OVERLAP_SECONDS)
+REFRESH_OVERLAP_SECONDS = 60
+POPULARITY_REFRESH_SECONDS = 600
+
+
+def normalize(text):
+    return WHITESPACE_RE.sub(" ", (text or "").strip().lower())
+
+
+def _index_keys(text):
+    words = normalize(text).split(" ")
+    return {" ".join(words[i:]) for i in range(min(len(words), MAX_WORD_STARTS)) if words[i]}
+
+
+class SuggestIndex:
+    """Prefix autocomplete over active product names and categories ranked
+    by units sold.
+
+    Keys live in one sorted list of (key, entry_id) so a prefix is a
+    contiguous range found by bisect. The ranked result for each queried
+    prefix is memoised and maintained in place when an entry is added,
+    removed or changes popularity, so lookups after warm-up are a dict hit.
+    Entry ids are ("product", id) or ("category", normalized name).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Serialises database syncs; see ProductSearchIndex
+        self._sync_lock = threading.RLock()
+        self._pending = None
+        self._reset()
+        self.built = False
+        self._bulk_loading = False
+        self._last_refresh = 0.0
+        self._last_popularity_refresh = 0.0
+
+    def _reset(self):
+        self.keys = []            # sorted [(key, entry_id)]
+        self.entries = {}         # entry_id -> {"text", "keys", "popularity"}
+        self.product_category = {}  # product_id -> category entry id
+        self.category_members = {}  # category entry id -> number of products
+        self.units_sold = {}      # product_id -> units
+        self.memo = OrderedDict() # prefix -> [entry_id, ...] best first, plus truncated flag
+        self.watermark = None
+
+    # ---- ranking ----
+
+    def _rank(self, entry_id):
+        entry = self.entries[entry_id]
+        return (-entry["popularity"], len(entry["text"]), entry["text"])
+
+    # ---- entry maintenance ----
+
+    def _add_entry(self, entry_id, text, popularity):
+        keys = _index_keys(text)
+        self.entries[entry_id] = {"text": text, "keys": keys, "popularity": popularity}
+        if self._bulk_loading:
+            # rebuild() sorts once at the end instead of inserting in order
+            self.keys.extend((key, entry_id) for key in keys)
+            return
+        for key in keys:
+            bisect.insort(self.keys, (key, entry_id))
+        self._memo_offer(entry_id)
+
+    def _remove_entry(self, entry_id):
+        entry = self.entries.get(entry_id)
+        if entry is None:
+            return
+        self._memo_withdraw(entry_id)
+        for key in entry["keys"]:
+            position = bisect.bisect_left(self.keys, (key, entry_id))
+            if position < len(self.keys) and self.keys[position] == (key, entry_id):
+                del self.keys[position]
+        del self.entries[entry_id]
+
+    def _set_popularity(self, entry_id, popularity):
+        entry = self.entries.get(entry_id)
+        if entry is None or entry["popularity"] == popularity:
+            return
+        self._memo_withdraw(entry_id)
+        entry["popularity"] = popularity
+        self._memo_offer(entry_id)
+
+    def _upsert_product(self, product_id, name, category, active):
+        self._remove_product(product_id)
+        if not active or not name:
+            return
+        self._add_entry(("product", product_id), name, self.units_sold.get(product_id, 0))
+
+        if category:
+            category_id = ("category", normalize(category))
+            self.product_category[product_id] = category_id
+            self.category_members[category_id] = self.category_members.get(category_id, 0) + 1
+            if category_id not in self.entries:
+                self._add_entry(category_id, category, self.units_sold.get(product_id, 0))
+            else:
+                self._bump_category(category_id, self.units_sold.get(product_id, 0))
+
+    def _remove_product(self, product_id):
+        self._remove_entry(("product", product_id))
+        category_id = self.product_category.pop(product_id, None)
+        if category_id is None:
+            return
+        remaining = self.category_members[category_id] - 1
+        if remaining:
+            self.category_members[category_id] = remaining
+            self._bump_category(category_id, -self.units_sold.get(product_id, 0))
+        else:
+            del self.category_members[category_id]
+            self._remove_entry(category_id)
+
+    def _bump_category(self, category_id, delta):
+        if delta:
+            entry = self.entries[category_id]
+            self._set_popularity(category_id, entry["popularity"] + delta)
+
+    def _add_units(self, product_id, delta):
+        self.units_sold[product_id] = self.units_sold.get(product_id, 0) + delta
+        product_entry = ("product", product_id)
+        if product_entry in self.entries:
+            self._set_popularity(product_entry, self.entries[product_entry]["popularity"] + delta)
+        category_id = self.product_category.get(product_id)
+        if category_id is not None:
+            self._bump_category(category_id, delta)
+
+    # ---- memoised top lists ----
+
+    def _memo_prefixes(self, entry_id):
+        prefixes = set()
+        if not self.memo:
+            return prefixes
+        for key in self.entries[entry_id]["keys"]:
+            for length in range(1, len(key) + 1):
+                if key[:length] in self.memo:
+                    prefixes.add(key[:length])
+        return prefixes
+
+    def _memo_offer(self, entry_id):
+        rank = self._rank(entry_id)
+        for prefix in self._memo_prefixes(entry_id):
+            top, truncated = self.memo[prefix]
+            if entry_id in top:
+                continue
+            # Anything ranked below the tail of a truncated list may be
+            # preceded by entries the list never saw
+            if truncated and top and rank >= self._rank(top[-1]):
+                continue
+            ranks = [self._rank(e) for e in top]
+            top.insert(bisect.bisect_left(ranks, rank), entry_id)
+            if len(top) > TOP_LIST_SIZE:
+                top.pop()
+                self.memo[prefix] = (top, True)
+
+    def _memo_withdraw(self, entry_id):
+        for prefix in self._memo_prefixes(entry_id):
+            top, _ = self.memo[prefix]
+            # What is left is still the best of the prefix, in order; a
+            # truncated list that got shorter than a lookup's limit is
+            # rescanned by suggest()
+            if entry_id in top:
+                top.remove(entry_id)
+
+    def _scan(self, prefix):
+        position = bisect.bisect_left(self.keys, (prefix,))
+        seen = set()
+        while position < len(self.keys) and self.keys[position][0].startswith(prefix):
+            seen.add(self.keys[position][1])
+            position += 1
+        top = heapq.nsmallest(TOP_LIST_SIZE, seen, key=self._rank)
+        return top, len(seen) > TOP_LIST_SIZE
+
+    def _remember(self, prefix, result):
+        self.memo[prefix] = result
+        self.memo.move_to_end(prefix)
+        while len(self.memo) > MEMO_MAX_PREFIXES:
+            self.memo.popitem(last=False)
+
+    def _warm_short_prefixes(self):
+        """Top lists for every 1..WARM_PREFIX_LENGTH character prefix in one
+        pass over the sorted keys."""
+        for length in range(1, WARM_PREFIX_LENGTH + 1):
+            for prefix, group in itertools.groupby(self.keys, key=lambda item: item[0][:length]):
+                if len(prefix) < length:
+                    continue
+                seen = {entry_id for _, entry_id in group}
+                top = heapq.nsmallest(TOP_LIST_SIZE, seen, key=self._rank)
+                self._remember(prefix, (top, len(seen) > TOP_LIST_SIZE))
+
+    # ---- public API ----
+
+    def rebuild(self, product_rows, units_sold):
+        """product_rows: (id, name, category, active, updated_at) tuples.
+
+        The new index is built off to the side and swapped in, so lookups
+        keep being served from the old one meanwhile. Product changes made
+        while it builds are replayed on it; units_sold is taken as is.
+        """
+        with self._sync_lock:
+            self._begin_sync()
+            try:
+                fresh = SuggestIndex()
+                fresh.units_sold = dict(units_sold)
+                fresh._bulk_loading = True
+                for product_id, name, category, active, updated_at in product_rows:
+                    fresh._upsert_product(product_id, name, category, active)
+                    if updated_at is not None and (fresh.watermark is None or updated_at > fresh.watermark):
+                        fresh.watermark = updated_at
+                fresh.keys.sort()
+                fresh._bulk_loading = False
+                fresh._warm_short_prefixes()
+
+                with self._lock:
+                    for change in self._pending:
+                        change(fresh)
+                    for attribute in ("keys", "entries", "product_category", "category_members",
+                                      "units_sold", "memo", "watermark"):
+                        setattr(self, attribute, getattr(fresh, attribute))
+                    self.built = True
+                    self._last_refresh = self._last_popularity_refresh = time.monotonic()
+            finally:
+                self._end_sync()
+
+    def _begin_sync(self):
+        with self._lock:
+            self._pending = []
+
+    def _end_sync(self):
+        with self._lock:
+            self._pending = None
+
+    def _apply(self, change):
+        """Apply change(index) now and, while a sync is reading the
+        database, again on top of what it read."""
+        with self._lock:
+            change(self)
+            if self._pending is not None:
+                self._pending.append(change)
+
+    def upsert(self, fields):
+        """fields: dict with id, name, category and active."""
+        product_id, name, category, active = fields["id"], fields["name"], fields["category"], fields["active"]
+        self._apply(lambda index: index._upsert_product(product_id, name, category, active))
+
+    def remove(self, product_id):
+        self._apply(lambda index: index._remove_product(product_id))
+
+    def record_sales(self, units_by_product):
+        """Apply units sold (negative for cancellations) to the ranking."""
+        with self._lock:
+            for product_id, delta in units_by_product.items():
+                self._add_units(product_id, delta)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def suggest(self, query, limit=8):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self._lock:
+            result = self.memo.get(prefix)
+            # Entries beyond a truncated list are unknown
+            if result is None or (result[1] and len(result[0]) < limit):
+                result = self._scan(prefix)
+                self._remember(prefix, result)
+            else:
+                self.memo.move_to_end(prefix)
+            suggestions = []
+            for entry_id in result[0][:limit]:
+                kind, ref = entry_id
+                suggestion = {"text": self.entries[entry_id]["text"], "type": kind}
+                if kind == "product":
+                    suggestion["product_id"] = ref
+                suggestions.append(suggestion)
+            return suggestions
+
+    # ---- database sync ----
+
+    def ensure_built(self):
+        if not self.built:
+            with self._sync_lock:
+                if not self.built:
+                    self.rebuild(_product_rows(), _units_sold())
+            return
+        now = time.monotonic()
+        if now - self._last_popularity_refresh > POPULARITY_REFRESH_SECONDS:
+            # Re-read units sold (other workers' orders) without blocking
+            # this request on a full rebuild
+            self._last_popularity_refresh = now
+            self._rebuild_in_background(current_app._get_current_object())
+        elif now - self._last_refresh > REFRESH_INTERVAL_SECONDS:
+            self.refresh()
+
+    def _rebuild_in_background(self, app):
+        def run():
+            with app.app_context():
+                try:
+                    self.rebuild(_product_rows(), _units_sold())
+                except Exception as e:
+                    print(f"Error rebuilding product suggest index: {str(e)}")
+
+        threading.Thread(target=run, name="suggest-index-rebuild", daemon=True).start()
+
+    def refresh(self):
+        """Catch up on product writes made by other workers, querying
+        without the index lock (see ProductSearchIndex.refresh); sales from
+        other workers are picked up by the periodic full rebuild."""
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_refresh = time.monotonic()
+            self._begin_sync()
+            try:
+                rows = []
+                if self.watermark is not None:
+                    since = self.watermark - timedelta(seconds=REFRESH_OVERLAP_SECONDS)
+                    rows = db.session.execute(
+                        db.select(Product.id, Product.name, Product.category, Product.active, Product.updated_at)
+                        .where(Product.updated_at >= since)
+                    ).all()
+                active_count = db.session.query(db.func.count(Product.id)).filter(Product.active.is_(True)).scalar()
+                with self._lock:
+                    for product_id, name, category, active, updated_at in rows:
+                        self._upsert_product(product_id, name, category, active)
+                        if updated_at > self.watermark:
+                            self.watermark = updated_at
+                    for change in self._pending:
+                        change(self)
+                    drifted = active_count != len(self.entries) - len(self.category_members)
+            finally:
+                self._end_sync()
+            if drifted:
+                self.rebuild(_product_rows(), _units_sold())
+        finally:
+            self._sync_lock.release()
+
+
+def _product_rows(batch_size=5000):
+    stmt = db.select(Product.id, Product.name, Product.category, Product.active, Product.updated_at) \
+        .where(Product.active.is_(True)).order_by(Product.id)
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        for row in result:
+            yield tuple(row)
+    finally:
+        result.close()
+
+
+def _units_sold():
+    stmt = db.select(OrderDetails.product_id, db.func.sum(OrderDetails.quantity)) \
+        .join(Order, Order.id == OrderDetails.order_id) \
+        .where(Order.status != "Cancelled") \
+        .group_by(OrderDetails.product_id)
+    return {product_id: int(units or 0) for product_id, units in db.session.execute(stmt)}
+
+
+product_suggest_index = SuggestIndex()
@@ -0,0 +1,87 @@
+# backend/tests/test_order_queries.py
+# Query counts of GET /api/order/get: the list view is served from the
+# orders row alone, the single-order view loads its line items and their
+# products in one extra query (services/orders.py order_details_options).
+#
+#   cd backend && TEST_DATABASE_URI=postgresql://... python -m pytest tests
+#
+# Needs TEST_DATABASE_URI, a scratch PostgreSQL database (the schema uses
+# PostgreSQL types); its tables are dropped and recreated.
+import contextlib
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+
+if not os.getenv("TEST_DATABASE_URI"):
+    pytest.skip("TEST_DATABASE_URI is not set", allow_module_level=True)
+os.environ["DATABASE_URI"] = os.environ["TEST_DATABASE_URI"]
+os.environ.setdefault("SECRET_KEY", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from models.order import Order
+from models.order_details import OrderDetails
+from models.product import Product
+from models.user import User
+
+
+@contextlib.contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(scope="module")
+def order_ids():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(User("alice", "alice@example.com", b"password"))
+        products = [Product(name=f"Product {i}", price=2.0, stock=10) for i in range(3)]
+        db.session.add_all(products)
+        db.session.flush()
+
+        ids = []
+        for _ in range(2):
+            order = Order("alice", "Alice", "Example", "1 Main St", None, "US", "NC", "Raleigh", "27601",
+                          "5550100", 6.0, 0.0, 0.0, 6.0, item_count=3, unit_count=3, preview=[])
+            db.session.add(order)
+            db.session.flush()
+            db.session.add_all(OrderDetails(order.id, product.id, 1, 2.0) for product in products)
+            ids.append(order.id)
+        db.session.commit()
+    yield ids
+    with app.app_context():
+        db.drop_all()
+
+
+def test_order_list_is_one_query(order_ids):
+    client = app.test_client()
+    with count_queries() as statements:
+        response = client.get("/api/order/get?username=alice")
+    assert response.status_code == 200
+    assert len(response.get_json()) == len(order_ids)
+    assert len(statements) == 1, statements
+
+
+def test_single_order_is_two_queries(order_ids):
+    client = app.test_client()
+    with count_queries() as statements:
+        response = client.get(f"/api/order/get?order_id={order_ids[0]}&username=alice")
+    assert response.status_code == 200
+    assert [item["product_name"] for item in response.get_json()["products"]] == \
+        ["Product 0", "Product 1", "Product 2"]
+    # The order, then its line items joined to their products
+    assert len(statements) == 2, statements
@@ -0,0 +1,12 @@
+# backend/wsgi.py
+# Entrypoint for a production WSGI server, e.g. gunicorn wsgi:app
+#
+# Each open /api/product/stream (server-sent events) holds its request's
+# thread for up to STREAM_MAX_SECONDS. Serve streams from gevent workers
+# (gunicorn -k gevent wsgi:app). With sync or gthread workers, set
+# STREAM_MAX_SUBSCRIBERS below the threads per worker, or streams will take
+# every thread and starve the other routes.
+from app import app, check_schema, start_background_workers
+
+check_schema()
+start_background_workers()
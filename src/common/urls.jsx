@@ -5,9 +5,11 @@ export const API_URLS = {
   // Product endpoints
   productsList: `${BASE_URL}/api/product/list`,
   productDetails: `${BASE_URL}/api/product/details`,
+  productDetailsBatch: `${BASE_URL}/api/product/details/batch`,
   addProducts: `${BASE_URL}/api/product/admin/add-products`,
   deleteAllProducts: `${BASE_URL}/api/product/admin/delete-all-products`,
   productSearch: `${BASE_URL}/api/product/search`,
+  productStream: `${BASE_URL}/api/product/stream`,
 
   // Auth endpoints
   signup: `${BASE_URL}/api/user/signup`,
@@ -51,6 +53,7 @@ export const API_URLS = {
   updateProduct: `${BASE_URL}/api/vendor/product`,
   deleteProduct: `${BASE_URL}/api/vendor/product`,
   bulkAddProducts: `${BASE_URL}/api/vendor/products/bulk`,
+  vendorOrders: `${BASE_URL}/api/vendor/orders`,
   
   // Vendor endpoints
   vendorAll: `${BASE_URL}/api/vendor/all`,